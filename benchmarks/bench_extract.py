@@ -0,0 +1,67 @@
+"""Throughput of extracting a GOG Linux installer.
+
+Generates an installer of the given size in MiB (a shell stub with a
+zip appended, like the real ones) with a mix of large, small, well and
+poorly compressible files, then extracts it with different numbers of
+worker threads.
+
+    PYTHONPATH=. python benchmarks/bench_extract.py [size_mib] [workers ...]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+from gogtool import installer
+
+MIB = 1024 * 1024
+
+
+def make_installer(path, size):
+    written = 0
+    i = 0
+    with open(path, 'wb') as f:
+        f.write(b'#!/bin/sh\nexit 0\n')
+        with zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED,
+                             compresslevel=1) as archive:
+            while written < size:
+                # Every tenth file is a large pak, the rest are small assets
+                file_size = 64 * MIB if i % 10 == 0 else 256 * 1024
+                if i % 2:
+                    data = os.urandom(file_size)
+                else:
+                    data = bytes(n % 251 for n in range(4096)) * (file_size // 4096)
+                name = f'data/noarch/game/data/{i % 16:02d}/file_{i}.bin'
+                archive.writestr(name, data)
+                written += file_size
+                i += 1
+    return written
+
+
+def bench(installer_path, dest, workers):
+    start = time.perf_counter()
+    installer.extract_linux_installer(installer_path, dest, workers=workers)
+    seconds = time.perf_counter() - start
+    shutil.rmtree(dest)
+    return seconds
+
+
+def main():
+    size = int(sys.argv[1]) * MIB if len(sys.argv) > 1 else 2048 * MIB
+    worker_counts = [int(n) for n in sys.argv[2:]] or [1, 2, 4, 8]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        installer_path = os.path.join(temp_dir, 'game.sh')
+        print(f"Generating {size // MIB} MiB installer...")
+        total = make_installer(installer_path, size)
+        dest = os.path.join(temp_dir, 'game')
+        for workers in worker_counts:
+            seconds = bench(installer_path, dest, workers)
+            print(f"{workers:2} workers: {seconds:6.2f} s "
+                  f"{total / MIB / seconds:8.1f} MiB/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Memory used by the game model for a large library.
+
+Compares the slotted Game/DLC/Installer model against a replica of the
+previous layout, which kept the raw game dict and plain instance dicts.
+
+    PYTHONPATH=. python benchmarks/bench_model.py [copies]
+"""
+import copy
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from gogtool import util
+from gogtool.game import Game, normalize_game_data
+
+DIR = os.path.dirname(__file__)
+DATA_PATH = os.path.join(DIR, "../tests/test_library_data/gamedetails.json")
+
+
+class LegacyGame:
+    """Attribute layout of Game before it used __slots__."""
+
+    def __init__(self, game_data):
+        self._data = game_data
+        self.name = game_data['gamename']
+        self.title = game_data['title']
+        self.installers = game_data['installers']
+        self.linux_available = any(
+            inst['platform'] == 4 for inst in self.installers
+        )
+        platform = 4 if self.linux_available else 1
+        self.server_files = {
+            inst['path'] for inst in self.installers
+            if inst['platform'] == platform
+        }
+        self.downloaded_files = set()
+        self.needs_update = False
+        self.download_dir = None
+        self.install_dir = None
+        self.dlc_installed = False
+        self.image_url = None
+        self.installable_dlcs = [
+            LegacyGame(dlc_data) for dlc_data in game_data.get('dlcs', [])
+            if 'installers' in dlc_data
+        ]
+        self.has_dlc = len(self.installable_dlcs) >= 1
+
+
+def make_library(copies):
+    gog_library = util.load_json(DATA_PATH)
+    games = []
+    for i in range(copies):
+        for game_data in copy.deepcopy(gog_library['games']):
+            game_data['gamename'] += f'_{i}'
+            games.append(game_data)
+    gog_library['games'] = games
+    fd, data_path = tempfile.mkstemp(suffix='.json')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(gog_library, f)
+    return data_path
+
+
+def measure(load):
+    tracemalloc.start()
+    games = load()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(games), current, peak
+
+
+def load_legacy(data_path):
+    return [LegacyGame(g) for g in util.load_json(data_path)['games']]
+
+
+def load_slotted(data_path):
+    gog_library = util.load_json_streamed(
+        data_path, 'games', normalize_game_data
+    )
+    return [Game(g) for g in gog_library['games']]
+
+
+def main(copies=30):
+    data_path = make_library(copies)
+    try:
+        for label, load in (('legacy', load_legacy), ('slotted', load_slotted)):
+            num_games, current, peak = measure(lambda: load(data_path))
+            print(
+                f"{label:<8} {num_games} games: "
+                f"retained {current / 2**20:7.1f} MiB, "
+                f"peak {peak / 2**20:7.1f} MiB, "
+                f"{current / num_games:6.0f} B/game"
+            )
+    finally:
+        os.remove(data_path)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,84 @@
+"""Time for matching directory entries against the library.
+
+Builds a synthetic library and download/install directories with the
+same number of entries, and compares Library's scans against the
+previous list based matching.
+
+    PYTHONPATH=. python benchmarks/bench_scan.py [num_games ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from gogtool.library import Library
+
+
+def make_library(num_games):
+    games = [
+        {
+            'gamename': f'game_{i}',
+            'title': f'Game {i}',
+            'installers': [],
+            'linux_available': False,
+        }
+        for i in range(num_games)
+    ]
+    return {'date': '20180101T000000', 'games': games}
+
+
+def make_dirs(root, num_games):
+    download_dir = os.path.join(root, 'downloads')
+    install_dir = os.path.join(root, 'games')
+    for i in range(num_games):
+        # A tenth of the entries doesn't belong to any game
+        suffix = '_unknown' if i % 10 == 0 else ''
+        os.makedirs(os.path.join(download_dir, f'game_{i}{suffix}'))
+        # Install dirs are named after the game name or the title
+        name = f'game_{i}' if i % 2 else f'Game {i}'
+        os.makedirs(os.path.join(install_dir, name + suffix))
+    return download_dir, install_dir
+
+
+def legacy_scan(library):
+    """Matching as done before the name/title index."""
+    game_names = library.get_all_values('gamename')
+    game_titles = library.get_all_values('title')
+    for item in os.listdir(library.download_dir):
+        item_path = os.path.join(library.download_dir, item)
+        if not (os.path.isdir(item_path) and item in game_names):
+            continue
+    for item in os.listdir(library.install_dir):
+        item_path = os.path.join(library.install_dir, item)
+        for gn, gt in zip(game_names, game_titles):
+            if os.path.isdir(item_path) and item in (gn, gt):
+                break
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main(*sizes):
+    for num_games in sizes or (1250, 2500, 5000):
+        with tempfile.TemporaryDirectory() as root:
+            download_dir, install_dir = make_dirs(root, num_games)
+            config = {
+                'download_dir': download_dir,
+                'install_dir': install_dir,
+                'lgogdownloader': {'subdir-game': '%gamename%'},
+            }
+            gog_library = make_library(num_games)
+            # Library scans both directories when it is created
+            indexed = timed(Library, gog_library, config)
+            legacy = timed(legacy_scan, Library(gog_library, config))
+        print(
+            f"{num_games:>6} games/entries: "
+            f"legacy {legacy:8.3f} s, indexed {indexed:8.3f} s"
+        )
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
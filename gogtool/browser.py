@@ -1,4 +1,5 @@
-from collections import Mapping, namedtuple
+from collections import namedtuple
+from collections.abc import Mapping
 
 from gogtool.main import initialize_gogtool, run_gogtool
 
@@ -25,35 +26,49 @@ Args = namedtuple_with_defaults(
         'clean',
         'debug',
         'download',
+        'dry_run',
         'edit_lgogconfig',
         'files',
+        'full',
         'info',
         'install',
         'launch',
         'list',
+        'pipeline',
         'platform',
         'refresh',
         'remove',
+        'repair',
         'uninstall',
         'update',
-        'view'
+        'verify',
+        'verify_install',
+        'view',
+        'watch'
     ],
     dict(
         clean=False,
         debug='warning',
         download=None,
+        dry_run=False,
         edit_lgogconfig=False,
         files=False,
+        full=False,
         info=False,
         install=None,
         launch=None,
         list=None,
+        pipeline=False,
         platform='l',
         refresh=False,
         remove=None,
+        repair=False,
         uninstall=None,
         update=None,
-        view=None
+        verify=None,
+        verify_install=None,
+        view=None,
+        watch=False
     )
 )
 
@@ -54,12 +54,43 @@ parser.add_argument(
     metavar='<game>',
     help="install game(s). if necessary, downloads setup files."
 )
+parser.add_argument(
+    '--pipeline',
+    action='store_true',
+    help="when installing several games, extract while still downloading"
+)
 parser.add_argument(
     '--uninstall',
     nargs='+',
     metavar='<game>',
     help="uninstall game(s)"
 )
+parser.add_argument(
+    '--dry-run',
+    action='store_true',
+    help="with --uninstall, only report the files that would be deleted"
+)
+parser.add_argument(
+    '--verify',
+    nargs='*',
+    metavar='<game>',
+    help="check downloaded setup files for corruption. all games if none given"
+)
+parser.add_argument(
+    '--verify-install',
+    metavar='<game>',
+    help="check the installed files of a game against its setup files"
+)
+parser.add_argument(
+    '--repair',
+    action='store_true',
+    help="with --verify-install, extract missing or damaged files again"
+)
+parser.add_argument(
+    '--full',
+    action='store_true',
+    help="with --verify-install, also read files that look unchanged"
+)
 parser.add_argument(
     '--remove',
     nargs='+',
@@ -103,6 +134,11 @@ parser.add_argument(
     metavar='<game>',
     help="start a game"
 )
+parser.add_argument(
+    '--watch',
+    action='store_true',
+    help="watch download and install directories and report changes"
+)
 
 
 def load_config(config_file):
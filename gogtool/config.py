@@ -5,11 +5,33 @@ import os
 import yaml
 
 DEFAULT_USER_CONFIG_PATH = os.path.expanduser('~/.gogtool.yaml')
+DEFAULT_CACHE_DIR = os.path.join(
+    os.getenv('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'gogtool'
+)
+DEFAULT_DATA_DIR = os.path.join(
+    os.getenv('XDG_DATA_HOME') or os.path.expanduser('~/.local/share'),
+    'gogtool'
+)
 
 DEFAULT_CONFIG = {
     'install_dir': '~/GOG Games',
     'lgog_config_path': '~/.config/lgogdownloader/config.cfg',
     'lgog_data_path': '~/.cache/lgogdownloader/gamedetails.json',
+    'lgog_xml_dir': '~/.cache/lgogdownloader/xml',
+    'cache_dir': DEFAULT_CACHE_DIR,
+    'data_dir': DEFAULT_DATA_DIR,
+    'gogdb_offline': False,
+    'gogdb_refresh_interval': 24,  # hours
+    'scan_workers': 8,
+    'download_jobs': 2,
+    'download_retries': 1,
+    'download_batch': False,
+    'install_workers': 2,
+    'extract_workers': 4,
+    'delete_workers': 8,
+    'verify_workers': 4,
+    'library_refresh_interval': 300,
+    'install_pipelined': False,
 }
 
 logger = logging.getLogger(__name__)
@@ -65,6 +87,9 @@ def configure_gogtool(config_file=None):
     config['install_dir'] = os.path.expanduser(config['install_dir'])
     config['lgog_config_path'] = os.path.expanduser(config['lgog_config_path'])
     config['lgog_data_path'] = os.path.expanduser(config['lgog_data_path'])
+    config['lgog_xml_dir'] = os.path.expanduser(config['lgog_xml_dir'])
+    config['cache_dir'] = os.path.expanduser(config['cache_dir'])
+    config['data_dir'] = os.path.expanduser(config['data_dir'])
 
     lgog_config = load_lgog_config(config['lgog_config_path'])
     # User settings have priority
@@ -1,30 +1,109 @@
 import logging
 import os
+import posixpath
 import re
-from functools import partial
+import sys
+import zipfile
 
-from gogtool import lgog, util
+from gogtool import installer, lgog, manifest, util
 
 logger = logging.getLogger(__name__)
 
+PLATFORM_WINDOWS = 1
+PLATFORM_LINUX = 4
+SETUP_FILE_RE = re.compile(r".*\.(zip|exe|bin|dmg|old|deb|tar\.gz|pkg|sh)$")
+
+
+class Installer:
+    """A setup file on the GOG server.
+
+    The directory part of the path is interned, since all installers of a
+    game usually share it.
+    """
+    __slots__ = ('platform', 'dirname', 'basename')
+
+    def __init__(self, platform, path):
+        self.platform = platform
+        dirname, self.basename = posixpath.split(path)
+        self.dirname = sys.intern(dirname)
+
+    def __repr__(self):
+        class_name = type(self).__name__
+        return f"{class_name}({self.platform}, {self.path})"
+
+    @property
+    def path(self):
+        return posixpath.join(self.dirname, self.basename)
+
+
+def is_linux_available(installers):
+    return any(platform == PLATFORM_LINUX for platform, path in installers)
+
+
+def normalize_game_data(game_data):
+    """Reduce raw lgogdownloader game data to what Game and DLC use.
+
+    Installers are stored as (platform, path) tuples. linux_available is
+    stored alongside, so it doesn't have to be derived again when the record
+    is reused.
+    """
+    installers = [
+        (inst['platform'], inst['path'])
+        for inst in game_data.get('installers', [])
+    ]
+    normalized = {
+        'gamename': game_data['gamename'],
+        'title': game_data['title'],
+        'installers': installers,
+        'linux_available': is_linux_available(installers),
+    }
+    dlcs = [
+        normalize_game_data(dlc_data) for dlc_data in game_data.get('dlcs', [])
+        if 'installers' in dlc_data
+    ]
+    if dlcs:
+        normalized['dlcs'] = dlcs
+    return normalized
+
 
 class Game:
-    def __init__(self, game_data, *, download_dir=None, install_dir=None):
-        self._data = game_data
-        self.name = game_data['gamename']
+    __slots__ = (
+        'name',
+        'title',
+        'installers',
+        'linux_available',
+        '_downloaded_files',
+        '_needs_update',
+        '_download_dir',
+        'install_dir',
+        'dlc_installed',
+        'installable_dlcs',
+        '_image_url',
+        '_image_resolver',
+    )
+
+    def __init__(self, game_data, *, download_dir=None, install_dir=None,
+                 image_resolver=None):
+        if 'linux_available' not in game_data:
+            game_data = normalize_game_data(game_data)
+        self.name = sys.intern(game_data['gamename'])
         self.title = game_data['title']
-        self.installers = game_data['installers']
-        self.linux_available = self.check_linux()
-        self.server_files = self.get_server_files()
-        self.downloaded_files = set()
-        self.needs_update = False
-        self.download_dir = download_dir
+        self.installers = tuple(
+            Installer(platform, path)
+            for platform, path in game_data['installers']
+        )
+        self.linux_available = game_data['linux_available']
+        self._downloaded_files = None
+        self._needs_update = None
+        self._download_dir = download_dir
         self.install_dir = install_dir
         self.dlc_installed = False
-        self.image_url = None
+        self._image_url = None
+        self._image_resolver = image_resolver
 
-        self.installable_dlcs = self.get_installable_dlcs()
-        self.has_dlc = len(self.installable_dlcs) >= 1
+        self.installable_dlcs = self.get_installable_dlcs(
+            game_data.get('dlcs', [])
+        )
 
     def __str__(self):
         return self.name
@@ -33,12 +112,44 @@ class Game:
         class_name = type(self).__name__
         return f"{class_name}({self.name})"
 
-    def __setattr__(self, name, value):
-        super().__setattr__(name, value)
-        if name == 'download_dir' and value is not None:
-            self.downloaded_files = self.find_downloaded_files()
-        if name == 'downloaded_files' and value != set():
-            self.needs_update = self.check_file_versions()
+    @property
+    def download_dir(self):
+        return self._download_dir
+
+    @download_dir.setter
+    def download_dir(self, value):
+        if value != self._download_dir:
+            self._download_dir = value
+            self.invalidate()
+
+    @property
+    def downloaded_files(self):
+        # The download dir is only read when this is first needed
+        if self._downloaded_files is None:
+            self._downloaded_files = self.find_downloaded_files()
+        return self._downloaded_files
+
+    @downloaded_files.setter
+    def downloaded_files(self, value):
+        self._downloaded_files = value
+        self._needs_update = None
+
+    @property
+    def needs_update(self):
+        if self._needs_update is None:
+            self._needs_update = self.is_downloaded and self.check_file_versions()
+        return self._needs_update
+
+    def invalidate(self):
+        """Forget the download state, it is read again on next access."""
+        self._downloaded_files = None
+        self._needs_update = None
+
+    @property
+    def image_url(self):
+        if self._image_url is None and self._image_resolver is not None:
+            self._image_url = self._image_resolver(self.name)
+        return self._image_url
 
     @property
     def is_downloaded(self):
@@ -48,45 +159,35 @@ class Game:
     def is_installed(self):
         return self.install_dir is not None
 
-    def check_linux(self):
-        for inst in self.installers:
-            if inst['platform'] == 4:
-                return True
-        return False
+    @property
+    def has_dlc(self):
+        return len(self.installable_dlcs) >= 1
 
-    def find_downloaded_files(self):
-        installer_re = re.compile(
-            r".*\.(zip|exe|bin|dmg|old|deb|tar\.gz|pkg|sh)$"
-        )
-        try:
-            dir_content = util.listdir(self.download_dir)
-        except (FileNotFoundError, TypeError):
-            logger.debug("%s not downloaded", self.name)
-            return set()
-        else:
-            return {df for df in dir_content if installer_re.search(df)}
+    @property
+    def server_installers(self):
+        platform = PLATFORM_LINUX if self.linux_available else PLATFORM_WINDOWS
+        return [inst for inst in self.installers if inst.platform == platform]
 
-    def get_server_files(self):
-        platform = 4 if self.linux_available else 1
-        files = set()
-        for inst in self.installers:
-            if inst['platform'] != platform:
-                continue
-            file_path = inst['path']
-            files.add(file_path)
-        return files
+    @property
+    def server_files(self):
+        return {inst.path for inst in self.server_installers}
+
+    def find_downloaded_files(self, dir_content=None):
+        if self.download_dir is None:
+            return set()
+        if dir_content is None:
+            dir_content = util.scandir(self.download_dir)
+        if not dir_content:
+            logger.debug("%s not downloaded", self.name)
+        return {e.path for e in dir_content if SETUP_FILE_RE.search(e.name)}
 
     def check_file_versions(self):
         current, old = self.match_server_files()
         return len(current) == 0
 
-    def get_installable_dlcs(self):
+    def get_installable_dlcs(self, dlcs_data):
         dlcs = []
-        if 'dlcs' not in self._data:
-            return dlcs
-        for dlc_data in self._data['dlcs']:
-            if 'installers' not in dlc_data:
-                continue
+        for dlc_data in dlcs_data:
             dlc_name = dlc_data['gamename']
             dlc_download_dir = None
             if self.download_dir:
@@ -99,7 +200,7 @@ class Game:
         downloaded_file_names = {
             os.path.basename(fp) for fp in self.downloaded_files
             }
-        server_file_names = {os.path.basename(fp) for fp in self.server_files}
+        server_file_names = {inst.basename for inst in self.server_installers}
         matched = downloaded_file_names & server_file_names
         unmatched = downloaded_file_names - server_file_names
         return (matched, unmatched)
@@ -107,7 +208,7 @@ class Game:
     def match_downloaded(self, basename=False):
         server_files = self.server_files
         if basename:
-            server_files = [os.path.basename(sf) for sf in self.server_files]
+            server_files = [inst.basename for inst in self.server_installers]
         if not self.is_downloaded:
             # Return all available files on the server
             return [sf for sf in server_files]
@@ -118,99 +219,240 @@ class Game:
         downloaded_ext = {return_match(df) for df in self.downloaded_files}
         return [sf for sf in server_files if return_match(sf) in downloaded_ext]
 
-    def download(self, download_dir):
-        platform = 'l' if self.linux_available else 'w'
+    @property
+    def lgog_platform(self):
+        return 'l' if self.linux_available else 'w'
+
+    def prepare_download(self):
+        """Return True if setup files have to be downloaded."""
         if self.is_downloaded and not self.needs_update:
-            print("Game files are up-to-date.")
-            return
+            print(f"Game files of '{self.name}' are up-to-date.")
+            return False
         elif self.is_downloaded and self.needs_update:
             delete_old = util.user_confirm("Delete old setup files?")
             if delete_old:
                 self.delete_setup_files()
+        return True
 
-        lgog.download(self.name, dest=download_dir, platform=platform)
-
+    def finish_download(self, download_dir):
         # Update downloaded files
         self.download_dir = os.path.join(download_dir, self.name)
-        self.downloaded_files = self.find_downloaded_files()
-        self.needs_update = self.check_file_versions()
+        self.invalidate()
+
+    def download(self, download_dir):
+        if not self.prepare_download():
+            return
+        lgog.download(self.name, dest=download_dir, platform=self.lgog_platform)
+        self.finish_download(download_dir)
+
+    @property
+    def needs_download(self):
+        return not self.is_downloaded or self.needs_update
 
-    def install(self, install_dir, download_dir):
+    def prepare_install(self):
+        """Return True if the game should be installed."""
         if not self.linux_available:
             print("Linux version not available. WINE support not implemented.")
-            return
+            return False
         if self.is_installed and not self.needs_update:
             print(f"Latest version of '{self.name}' is already installed.")
-            return
+            return False
         elif self.is_installed and self.needs_update:
             user_prompt = f"Installation of '{self.name}' is outdated. Update?"
-            update = util.user_confirm(user_prompt)
-            if update:
-                self.download(download_dir)
-                self.install(install_dir)
-            else:
-                return
-        elif not self.is_downloaded:
+            return util.user_confirm(user_prompt)
+        return True
+
+    def get_installer_path(self):
+        basename = self.server_installers[0].basename
+        return os.path.join(self.download_dir, basename)
+
+    def install_tasks(self, install_dir):
+        """Return (installer, destination, origin) tuples, the base game
+        before its DLCs. origin is the name of the game or DLC.
+        """
+        game_install_dir = self.game_install_dir(install_dir)
+        tasks = [(self.get_installer_path(), game_install_dir, self.name)]
+        for dlc in self.installable_dlcs:
+            if not (dlc.is_downloaded and dlc.linux_available):
+                continue
+            tasks.append((dlc.get_installer_path(), game_install_dir, dlc.name))
+        return tasks
+
+    def game_install_dir(self, install_dir):
+        """Return the directory the game is installed to, which is named
+        after the game in install_dir for new installations.
+        """
+        if self.install_dir is not None:
+            # May be named after the title
+            return self.install_dir
+        return os.path.join(install_dir, self.name)
+
+    def finish_install(self, install_dir):
+        self.install_dir = self.game_install_dir(install_dir)
+        self.dlc_installed = self.has_dlc
+
+    def install(self, install_dir, download_dir, extract_workers=1):
+        if not self.prepare_install():
+            return
+        self.extract(install_dir, download_dir, extract_workers)
+
+    def extract(self, install_dir, download_dir, extract_workers=1):
+        """Download if necessary and extract the installers of the game and
+        its DLCs. Files of an existing installation that didn't change are
+        left alone.
+        """
+        if self.needs_download:
             self.download(download_dir)
 
-        installer = os.path.basename(self.server_files.pop())
-        installer_path = os.path.join(self.download_dir, installer)
-        self.install_dir = os.path.join(install_dir, self.name)
-        util.extract_linux_installer(installer_path, self.install_dir)
-
-        if self.has_dlc:
-            self.install_dlc()
+        for installer_path, dest, origin in self.install_tasks(install_dir):
+            try:
+                installer.extract_linux_installer(
+                    installer_path, dest, workers=extract_workers, origin=origin
+                )
+            except (zipfile.BadZipFile, OSError) as e:
+                log_msg = f"Installing '{self.name}' failed: {e}"
+                logger.error(log_msg)
+                print(log_msg)
+                return
+        self.finish_install(install_dir)
 
-    def install_dlc(self):
+    def install_dlc(self, extract_workers=1):
         for dlc in self.installable_dlcs:
             if not dlc.is_downloaded:
                 continue
-            installer = os.path.basename(dlc.server_files.pop())
-            installer_path = os.path.join(dlc.download_dir, installer)
-            util.extract_linux_installer(installer_path, self.install_dir)
+            installer_path = dlc.get_installer_path()
+            installer.extract_linux_installer(
+                installer_path, self.install_dir, workers=extract_workers,
+                origin=dlc.name
+            )
         self.dlc_installed = True
 
-    def update(self):
-        logger.warning("Update not implemented")
-        print("Update not implemented")
+    def update(self, download_dir, extract_workers=1):
+        """Bring an installation up to date with the latest installers."""
+        if not self.is_installed:
+            log_msg = f"'{self.name}' is not installed."
+            logger.error(log_msg)
+            print(log_msg)
+            return
+        install_dir = os.path.dirname(self.install_dir)
+        self.extract(install_dir, download_dir, extract_workers)
+
+    def verify_install(self, repair=False, workers=1, full=False):
+        """Check the installed files against the manifest and optionally
+        extract missing or damaged files again from the setup files that
+        wrote them. Unless full is set, files whose mtime is unchanged
+        since they were written aren't read.
+        """
+        if not self.is_installed:
+            log_msg = f"'{self.name}' is not installed."
+            logger.error(log_msg)
+            print(log_msg)
+            return None
+        entries = manifest.read_manifest(self.install_dir)
+        if not entries:
+            log_msg = f"No manifest of the installed files of '{self.name}' found."
+            logger.error(log_msg)
+            print(log_msg)
+            return None
+
+        try:
+            damaged = installer.verify_install(
+                self.install_dir, entries, workers=workers, full=full
+            )
+        except OSError as e:
+            log_msg = f"Verifying '{self.name}' failed: {e}"
+            logger.error(log_msg)
+            print(log_msg)
+            return None
+
+        for path, damage in sorted(damaged.items()):
+            print(f"{damage.reason}: {os.path.relpath(path, self.install_dir)}")
+        print(f"'{self.name}': {len(damaged)} missing or damaged files")
+        if repair and damaged:
+            try:
+                repaired, unavailable = installer.repair_install(
+                    self.install_dir, damaged, self.local_installers(),
+                    workers=workers
+                )
+            except (zipfile.BadZipFile, OSError) as e:
+                log_msg = f"Repairing '{self.name}' failed: {e}"
+                logger.error(log_msg)
+                print(log_msg)
+                return damaged
+            print(f"Repaired {len(repaired)} files")
+            for entry in unavailable:
+                log_msg = f"Setup file {entry.installer} not found for {entry.path}"
+                logger.warning(log_msg)
+                print(log_msg)
+        return damaged
+
+    def local_installers(self):
+        """Map the basenames of the downloaded setup files of the game and
+        its DLCs to their paths.
+        """
+        paths = set(self.downloaded_files)
+        for dlc in self.installable_dlcs:
+            paths |= dlc.downloaded_files
+        return {os.path.basename(path): path for path in paths}
 
-    def uninstall(self):
+    def uninstall(self, dry_run=False, workers=1):
         if not self.is_installed:
             log_msg = f"'{self.name}' is not installed."
             logger.error(log_msg)
             print(log_msg)
             return
         try:
-            # Only delete files and directories in the file list
-            self.uninstall_from_list()
+            # Only delete the files that were installed
+            installed_files = self.installed_files()
         except FileNotFoundError:
             logger.warning("File list not found")
+            if dry_run:
+                print(f"No list of installed files for '{self.name}' found.")
+                return
             user_prompt = "No list of installed files found. Remove entire game folder?"
             if util.user_confirm(user_prompt):
                 util.rmdir(self.install_dir)
+        else:
+            if dry_run:
+                count, size = installer.measure_files(
+                    self.install_dir, installed_files
+                )
+                print(f"Uninstalling '{self.name}' would delete {count} files "
+                      f"({util.format_size(size)}) from {self.install_dir}")
+                return
+            self.uninstall_files(installed_files, workers)
 
         if util.user_confirm("Delete setup files?"):
             self.delete_setup_files()
 
-    def uninstall_from_list(self):
+    def installed_files(self):
+        """Return the installed files relative to the install dir, from the
+        manifest or, for older installations, from files.txt.
+        """
+        entries = manifest.read_manifest(self.install_dir)
+        if entries:
+            return list(entries)
+
         logger.debug("Reading file list")
         file_list = os.path.join(self.install_dir, 'files.txt')
         with open(file_list) as f:
-            fformat = partial(Game.format_file_path, self.install_dir)
-            installed_files = {fformat(fp) for fp in f.readlines()}
-
-        dir_content = util.listdir(self.install_dir)
-        for item in dir_content:
-            if item not in installed_files:
-                continue
-            if os.path.isfile(item):
-                util.rm(item)
-            elif os.path.isdir(item):
-                util.rmdir(item)
-        util.rm(file_list)
+            # Directories end with a slash
+            return [
+                Game.format_file_path(line) for line in f
+                if line.strip() and not line.strip().endswith('/')
+            ]
+
+    def uninstall_files(self, installed_files, workers=1):
+        removed = installer.remove_files(
+            self.install_dir, installed_files, workers=workers
+        )
+        logger.info("Removed %d files of %s", removed, self.name)
+        manifest.remove_manifest(self.install_dir)
+        legacy_file_list = os.path.join(self.install_dir, 'files.txt')
+        if os.path.exists(legacy_file_list):
+            util.rm(legacy_file_list)
 
-        dir_content = util.listdir(self.install_dir)
-        if not dir_content:
+        if not util.listdir(self.install_dir):
             util.rmdir(self.install_dir)
 
     def delete_setup_files(self):
@@ -220,8 +462,7 @@ class Game:
             print(log_msg)
             return
         util.rm_all(self.downloaded_files)
-        # Update downloaded files
-        self.downloaded_files = self.find_downloaded_files()
+        self.invalidate()
 
     def remove(self):
         if self.is_installed:
@@ -248,13 +489,14 @@ class Game:
             util.run_command([start_script], silent=True)
 
     @staticmethod
-    def format_file_path(game_install_dir, filename):
-        file_ = filename.strip().replace('data/noarch/', '')
-        file_path = os.path.join(game_install_dir, file_)
-        return os.path.normpath(file_path)
+    def format_file_path(filename):
+        file_ = filename.strip().replace('data/noarch/', '', 1)
+        return os.path.normpath(file_)
 
 
 class DLC(Game):
+    __slots__ = ('base_game',)
+
     def __init__(self, base_game, dlc_data, download_dir):
         super().__init__(dlc_data, download_dir=download_dir)
         self.base_game = base_game
@@ -268,4 +510,4 @@ class DLC(Game):
 
 
 class Patch(DLC):
-    pass
+    __slots__ = ()
@@ -1,54 +1,225 @@
 import csv
+import glob
 import io
+import json
 import logging
 import os
+import posixpath
 import requests
+import sqlite3
+import tempfile
+import time
 import zipfile
 
+from gogtool.config import DEFAULT_CACHE_DIR
+
 logger = logging.getLogger(__name__)
 
 GOGDB_BASE_URL = 'https://www.gogdb.org/backups/'
+INDEX_SUFFIX = '.sqlite'
+ARCHIVE_PATTERN = 'gogdb_*.zip'
+STATE_FILE = 'filelist.json'
+CHUNK_SIZE = 1024 * 1024
+REQUEST_TIMEOUT = 30
+
+
+class GOGDBError(Exception):
+    pass
 
 
 class GOGDB:
-    def __init__(self):
-        self.db_archive = self.download_latest()
-        self.csv_data = self.read_csv_from_zip(self.db_archive, 'products.csv')
+    def __init__(self, db_archive=None, offline=False, cache_dir=None,
+                 refresh_interval=0, base_url=GOGDB_BASE_URL):
+        self.cache_dir = os.path.join(cache_dir or DEFAULT_CACHE_DIR, 'gogdb')
+        self.refresh_interval = refresh_interval
+        self.base_url = base_url
+
+        if db_archive is None and not offline:
+            try:
+                db_archive = self.download_latest()
+            except (requests.RequestException, GOGDBError) as e:
+                logger.warning("gogdb not reachable, using cached archive: %s", e)
+        if db_archive is None:
+            db_archive = self.find_cached()
+        self.db_archive = db_archive
+        self.index_path = self.db_archive + INDEX_SUFFIX
+        if not os.path.exists(self.index_path):
+            try:
+                self.build_index(self.db_archive, 'products.csv', self.index_path)
+            except (zipfile.BadZipFile, KeyError, csv.Error, sqlite3.Error) as e:
+                raise GOGDBError(f"can't read {self.db_archive}: {e}") from e
+        self._db = None
+
+    @property
+    def db(self):
+        # Opened on first lookup, read-only
+        if self._db is None:
+            self._db = sqlite3.connect(
+                f'file:{self.index_path}?mode=ro',
+                uri=True,
+                check_same_thread=False
+            )
+            self._db.row_factory = sqlite3.Row
+        return self._db
+
+    @property
+    def state_path(self):
+        return os.path.join(self.cache_dir, STATE_FILE)
+
+    def load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_state(self, state):
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_path)
+
+    def get_file_list(self, state):
+        """Fetch filelist.txt, reusing the cached copy if it is unchanged."""
+        headers = {}
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+
+        res = requests.get(
+            self.base_url + 'filelist.txt',
+            headers=headers,
+            timeout=REQUEST_TIMEOUT
+        )
+        if res.status_code == 304 and 'files' in state:
+            logger.debug("gogdb file list not modified")
+            return state['files']
+        res.raise_for_status()
 
-    def get_file_list(self):
-        res = requests.get(GOGDB_BASE_URL + 'filelist.txt')
+        state['etag'] = res.headers.get('ETag')
+        state['last_modified'] = res.headers.get('Last-Modified')
         res_str = res.content.decode('utf-8')
         return res_str.split('\n')[:-1]
 
     def download_latest(self):
-        file_list = self.get_file_list()
-        latest_backup_url = file_list[-1]
-        file_name = latest_backup_url.split('/')[1]
+        os.makedirs(self.cache_dir, exist_ok=True)
+        state = self.load_state()
+        latest = state.get('latest')
+        age = time.time() - state.get('checked', 0)
+        if latest and age < self.refresh_interval:
+            file_path = os.path.join(self.cache_dir, latest)
+            if os.path.exists(file_path):
+                logger.info("gogdb archive checked %d s ago, skipping", age)
+                return file_path
 
-        if os.path.exists(file_name):
+        state['files'] = self.get_file_list(state)
+        state['checked'] = time.time()
+        if not state['files']:
+            raise GOGDBError("gogdb file list is empty")
+        latest_backup_url = state['files'][-1]
+        file_name = posixpath.basename(latest_backup_url)
+        file_path = os.path.join(self.cache_dir, file_name)
+
+        if os.path.exists(file_path):
             logger.info("latest gogdb archive already downloaded")
         else:
             logger.info("retrieving latest gogdb archive")
-            res = requests.get(GOGDB_BASE_URL + latest_backup_url)
-            with open(file_name, 'wb') as f:
-                f.write(res.content)
+            self.download_file(self.base_url + latest_backup_url, file_path)
+
+        state['latest'] = file_name
+        self.save_state(state)
+        self.prune(keep=file_path)
+        return file_path
+
+    def download_file(self, url, file_path):
+        """Stream url into a temp file and move it into place when complete."""
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.part')
+        try:
+            with requests.get(url, stream=True, timeout=REQUEST_TIMEOUT) as res:
+                res.raise_for_status()
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in res.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def prune(self, keep):
+        """Remove all cached archives (and their indexes) except keep."""
+        for archive in glob.glob(os.path.join(self.cache_dir, ARCHIVE_PATTERN)):
+            if archive == keep:
+                continue
+            logger.info("removing old gogdb archive: %s", archive)
+            for file_path in (archive, archive + INDEX_SUFFIX):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
 
-        return file_name
+    def find_cached(self):
+        latest = self.load_state().get('latest')
+        if latest and os.path.exists(os.path.join(self.cache_dir, latest)):
+            archives = [os.path.join(self.cache_dir, latest)]
+        else:
+            archives = sorted(
+                glob.glob(os.path.join(self.cache_dir, ARCHIVE_PATTERN))
+            )
+        if not archives:
+            raise GOGDBError("no cached gogdb archive found")
+        logger.info("using cached gogdb archive: %s", archives[-1])
+        return archives[-1]
 
     def read_csv_from_zip(self, file_name, csv_file):
         with zipfile.ZipFile(file_name) as archive:
-            csv_bytes = archive.read(csv_file)
-            byte_stream = io.BytesIO(csv_bytes)
-            byte_stream_decoded = (b.decode('utf-8') for b in byte_stream)
-            csv_reader = csv.DictReader(byte_stream_decoded)
-            return list(csv_reader)
+            with archive.open(csv_file) as byte_stream:
+                text_stream = io.TextIOWrapper(
+                    byte_stream, encoding='utf-8', newline=''
+                )
+                yield from csv.DictReader(text_stream)
+
+    def build_index(self, file_name, csv_file, index_path):
+        """Compile a csv file from the archive into a sqlite table keyed by slug."""
+        logger.info("building gogdb index: %s", index_path)
+        rows = self.read_csv_from_zip(file_name, csv_file)
+        first_row = next(rows, None)
+        if first_row is None:
+            columns = ['slug']
+        else:
+            columns = list(first_row)
+
+        index_dir = os.path.dirname(os.path.abspath(index_path))
+        fd, temp_path = tempfile.mkstemp(dir=index_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            con = sqlite3.connect(temp_path)
+            column_defs = ", ".join(
+                f'"{c}" TEXT PRIMARY KEY' if c == 'slug' else f'"{c}" TEXT'
+                for c in columns
+            )
+            con.execute(f'CREATE TABLE products ({column_defs})')
+            placeholders = ", ".join("?" for _ in columns)
+            # Keep the first row for duplicate slugs, like the old linear scan
+            insert = f'INSERT OR IGNORE INTO products VALUES ({placeholders})'
+            if first_row is not None:
+                con.execute(insert, [first_row[c] for c in columns])
+            con.executemany(insert, ([r[c] for c in columns] for r in rows))
+            con.commit()
+            con.close()
+            os.replace(temp_path, index_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
 
     def get_game(self, slug):
-        for game in self.csv_data:
-            if game['slug'] != slug:
-                continue
-            return game
+        row = self.db.execute(
+            'SELECT * FROM products WHERE slug = ?', (slug,)
+        ).fetchone()
+        if row is not None:
+            return dict(row)
 
     def get_game_img(self, slug):
         game = self.get_game(slug)
+        if game is None:
+            logger.debug("%s not found in gogdb", slug)
+            return None
         return game['image_logo']
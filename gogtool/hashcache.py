@@ -0,0 +1,140 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from gogtool import util
+from gogtool.state import RACY_INTERVAL_NS
+
+logger = logging.getLogger(__name__)
+
+HASH_CACHE_FILE = 'hashes.sqlite'
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    dev INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    algorithm TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (dev, inode, algorithm)
+);
+"""
+
+
+def hash_file(path, algorithm='md5', block_size=HASH_BLOCK_SIZE):
+    """Hex digest of a file, read in large blocks into a reused buffer."""
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(block_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+class HashCache:
+    """Persistent cache of file content hashes.
+
+    Hashes are stored by device, inode, size and mtime, so they survive
+    renames and moves within a file system and are recomputed as soon as
+    a file changes. Concurrent requests for the same file wait for the
+    one hash in progress instead of reading the file again.
+    """
+
+    def __init__(self, db_path, algorithm='md5', block_size=HASH_BLOCK_SIZE):
+        util.mkdir(os.path.dirname(db_path))
+        self.db_path = db_path
+        self.algorithm = algorithm
+        self.block_size = block_size
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.pending = {}
+        with self.lock, self.db:
+            self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def file_key(st):
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _lookup(self, key):
+        dev, inode, size, mtime_ns = key
+        row = self.db.execute(
+            'SELECT size, mtime_ns, digest FROM hashes '
+            'WHERE dev = ? AND inode = ? AND algorithm = ?',
+            (dev, inode, self.algorithm)
+        ).fetchone()
+        if row is not None and row[:2] == (size, mtime_ns):
+            return row[2]
+        return None
+
+    def get(self, path):
+        """Return the cached hash of path, or None without hashing it."""
+        key = self.file_key(os.stat(path))
+        with self.lock:
+            return self._lookup(key)
+
+    def hash(self, path):
+        """Return the hash of path, computing and storing it if necessary."""
+        key = self.file_key(os.stat(path))
+        with self.lock:
+            digest = self._lookup(key)
+            if digest is not None:
+                return digest
+            future = self.pending.get(key)
+            if future is None:
+                future = self.pending[key] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            return future.result()
+
+        logger.debug("Hashing %s", path)
+        try:
+            digest = hash_file(path, self.algorithm, self.block_size)
+        except BaseException as e:
+            with self.lock:
+                del self.pending[key]
+            future.set_exception(e)
+            raise
+
+        dev, inode, size, mtime_ns = key
+        with self.lock:
+            # A change within the same mtime tick would go unnoticed
+            if time.time_ns() - mtime_ns > RACY_INTERVAL_NS:
+                with self.db:
+                    self.db.execute(
+                        'INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        (dev, inode, self.algorithm, size, mtime_ns, digest, path)
+                    )
+            del self.pending[key]
+        future.set_result(digest)
+        return digest
+
+    def prefill(self, paths, workers=1):
+        """Hash paths on a background thread pool. Return the executor,
+        whose shutdown() waits for the remaining hashes.
+        """
+        executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        for path in paths:
+            executor.submit(self._prefill_one, path)
+        return executor
+
+    def _prefill_one(self, path):
+        try:
+            self.hash(path)
+        except OSError as e:
+            logger.warning("Could not hash %s: %s", path, e)
@@ -0,0 +1,344 @@
+import logging
+import os
+import shutil
+import stat
+import zipfile
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from gogtool import manifest, util
+
+logger = logging.getLogger(__name__)
+
+GAME_FILES_PREFIX = 'data/noarch/'
+COPY_BUFFER_SIZE = 1024 * 1024
+DEFAULT_FILE_MODE = 0o644
+
+# An installed file that doesn't match its manifest entry
+Damage = namedtuple('Damage', 'entry reason')
+
+
+def game_members(archive):
+    """Return the zip members of a GOG installer that belong to the game."""
+    return [
+        info for info in archive.infolist()
+        if info.filename.startswith(GAME_FILES_PREFIX) and
+        info.filename != GAME_FILES_PREFIX
+    ]
+
+
+def member_path(dest, info):
+    relpath = info.filename[len(GAME_FILES_PREFIX):]
+    path = os.path.normpath(os.path.join(dest, relpath))
+    if os.path.commonpath([dest, path]) != dest:
+        raise ValueError(f"Member outside of install dir: {info.filename}")
+    return path
+
+
+def check_parent(real_dest, path, info):
+    """Make sure the directory of path doesn't lead out of the install dir
+    through a symlink written by an earlier member.
+    """
+    parent = os.path.realpath(os.path.dirname(path))
+    if os.path.commonpath([real_dest, parent]) != real_dest:
+        raise ValueError(f"Member outside of install dir: {info.filename}")
+
+
+def member_mode(info):
+    return info.external_attr >> 16
+
+
+def extract_member(archive, info, path):
+    mode = member_mode(info)
+    if info.is_dir():
+        os.makedirs(path, exist_ok=True)
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.lexists(path) and not os.path.isdir(path):
+        # Unlink first, so running executables can be replaced
+        os.unlink(path)
+
+    if stat.S_ISLNK(mode):
+        os.symlink(archive.read(info).decode('utf-8'), path)
+        return
+
+    file_mode = stat.S_IMODE(mode) or DEFAULT_FILE_MODE
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, file_mode)
+    with archive.open(info) as src, os.fdopen(fd, 'wb') as dst:
+        shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+        # Not subject to the umask, like unzip
+        os.fchmod(dst.fileno(), file_mode)
+
+
+def split_members(members, parts):
+    """Split members into parts of about the same uncompressed size."""
+    chunks = [[] for _ in range(parts)]
+    sizes = [0] * parts
+    for info in sorted(members, key=lambda i: i.file_size, reverse=True):
+        smallest = sizes.index(min(sizes))
+        chunks[smallest].append(info)
+        sizes[smallest] += info.file_size
+    return [chunk for chunk in chunks if chunk]
+
+
+def is_unchanged(entry, info, path):
+    """Return True if the installed file at path matches the member."""
+    if entry is None or (entry.size, entry.crc) != (info.file_size, info.CRC):
+        return False
+    try:
+        return os.lstat(path).st_size == info.file_size
+    except FileNotFoundError:
+        return False
+
+
+def remove_files(dest, paths, workers=1):
+    """Remove installed files, deepest first, and the directories they leave
+    empty. paths are relative to dest. Return the number of files removed.
+    """
+    paths = sorted(
+        (os.path.join(dest, relpath) for relpath in paths),
+        key=lambda path: path.count(os.sep), reverse=True
+    )
+    removed = util.unlink_many(paths, workers=workers)
+    util.prune_empty_dirs((os.path.dirname(path) for path in paths), dest)
+    return removed
+
+
+def measure_files(dest, paths):
+    """Return the number and total size of the files in paths that exist."""
+    count = size = 0
+    for relpath in paths:
+        try:
+            size += os.lstat(os.path.join(dest, relpath)).st_size
+        except FileNotFoundError:
+            continue
+        count += 1
+    return count, size
+
+
+def extract_members(installer, dest, members, done=None):
+    """Extract members with a separate handle into the archive. Members
+    are appended to done once they are written.
+    """
+    real_dest = os.path.realpath(dest)
+    with zipfile.ZipFile(installer) as archive:
+        for info in members:
+            path = member_path(dest, info)
+            check_parent(real_dest, path, info)
+            extract_member(archive, info, path)
+            if done is not None:
+                done.append(info)
+
+
+def write_members(installer, dest, members, workers=1, done=None):
+    """Extract members of installer into dest, split between threads."""
+    if workers <= 1 or len(members) <= 1:
+        extract_members(installer, dest, members, done)
+        return
+    chunks = split_members(members, workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(extract_members, installer, dest, chunk, done)
+            for chunk in chunks
+        ]
+        for future in futures:
+            future.result()
+
+
+def extract_linux_installer(installer, dest, workers=1, origin=None):
+    """Extract the game files of a GOG Linux installer into dest.
+
+    The installer is a shell script with a zip archive appended, which
+    zipfile reads directly. Files are written to their final paths and
+    recorded in the manifest of dest, see gogtool.manifest.
+
+    If dest already holds files from an earlier installer of origin (the
+    game or DLC name), this is an update: only members whose size or CRC
+    differ from the manifest are written, and files the new installer no
+    longer contains are removed. Returns the members that were written.
+
+    With more than one worker, the files are split between threads that
+    each read the archive through their own file handle. zlib and file
+    I/O release the GIL, so large installers extract in parallel.
+    """
+    dest = os.path.abspath(dest)
+    logger.debug("Extracting %s to %s", installer, dest)
+    os.makedirs(dest, exist_ok=True)
+    installed = manifest.read_manifest(dest)
+    with zipfile.ZipFile(installer) as archive:
+        members = game_members(archive)
+    # Later members win if a path is repeated
+    dirs = []
+    files = {}
+    for info in members:
+        path = member_path(dest, info)
+        if info.is_dir():
+            dirs.append((path, info))
+        else:
+            files[os.path.relpath(path, dest)] = info
+
+    # Without an origin, files of other installers can't be told apart
+    vanished = [
+        entry.path for entry in installed.values()
+        if origin is not None and entry.origin == origin and
+        entry.path not in files
+    ]
+    changed = [
+        info for relpath, info in files.items()
+        if not is_unchanged(installed.get(relpath), info,
+                            os.path.join(dest, relpath))
+    ]
+    written = []
+    try:
+        # Removed first, a file may have become a directory or vice versa
+        remove_files(dest, vanished)
+        for relpath in vanished:
+            del installed[relpath]
+        real_dest = os.path.realpath(dest)
+        for path, info in dirs:
+            check_parent(real_dest, path, info)
+            os.makedirs(path, exist_ok=True)
+        write_members(installer, dest, changed, workers, done=written)
+    finally:
+        # Also record what was written if extracting failed
+        record_members(dest, installed, files, changed, written,
+                       os.path.basename(installer), origin)
+        manifest.write_manifest(dest, installed.values())
+    logger.info("%s: %d of %d files written, %d removed", installer,
+                len(changed), len(files), len(vanished))
+    return changed
+
+
+def record_members(dest, installed, files, changed, written, installer_name,
+                   origin):
+    """Update the manifest entries in installed for the members in files.
+
+    Written members get the mtime they have now, unchanged ones keep
+    theirs. Changed members that weren't written get neither CRC nor
+    mtime, so that they are written on the next update and verify_install
+    reports them.
+    """
+    changed = set(id(info) for info in changed)
+    written = set(id(info) for info in written)
+    for relpath, info in files.items():
+        old = installed.get(relpath)
+        path = os.path.join(dest, relpath)
+        crc = info.CRC
+        if id(info) in written:
+            mtime_ns = os.lstat(path).st_mtime_ns
+        elif id(info) in changed:
+            crc = mtime_ns = None
+        elif old.mtime_ns is None:
+            # Manifests from before mtimes were recorded
+            mtime_ns = os.lstat(path).st_mtime_ns
+        else:
+            mtime_ns = old.mtime_ns
+        installed[relpath] = manifest.Entry(
+            relpath, info.file_size, crc, member_mode(info),
+            installer_name, origin, mtime_ns
+        )
+
+
+def file_crc(path, block_size=COPY_BUFFER_SIZE):
+    crc = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            crc = zlib.crc32(block, crc)
+    return crc
+
+
+def check_file(path, entry, full=False):
+    """Compare the file at path with its manifest entry.
+
+    Return (reason, read): reason says why the file doesn't match, or is
+    None. read is True if only its content can tell, i.e. the file isn't
+    a symlink and its mtime differs from the one recorded, or full is set.
+    """
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return "missing", False
+    if stat.S_ISLNK(entry.mode or 0):
+        if not stat.S_ISLNK(st.st_mode):
+            return "not a symlink", False
+        if zlib.crc32(os.readlink(path).encode('utf-8')) != entry.crc:
+            return "wrong link target", False
+        return None, False
+    if not stat.S_ISREG(st.st_mode):
+        return "not a file", False
+    if st.st_size != entry.size:
+        return "size differs", False
+    return None, full or st.st_mtime_ns != entry.mtime_ns
+
+
+def verify_install(dest, entries, workers=1, full=False):
+    """Compare the files in dest with their manifest entries.
+
+    Missing files, wrong types and sizes are found with lstat alone.
+    Files whose mtime is still the one recorded when they were written
+    are taken as unchanged, unless full is set; the CRC32 of the others
+    is computed on a thread pool. Returns the damaged files as
+    {path: Damage}.
+    """
+    dest = os.path.abspath(dest)
+    damaged = {}
+    to_read = []
+    for entry in entries.values():
+        path = os.path.join(dest, entry.path)
+        reason, read = check_file(path, entry, full)
+        if reason is not None:
+            damaged[path] = Damage(entry, reason)
+        elif read:
+            to_read.append((path, entry))
+
+    logger.debug("%d files to check, %d damaged by stat, reading %d",
+                 len(entries), len(damaged), len(to_read))
+    paths = [path for path, entry in to_read]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for (path, entry), crc in zip(to_read, executor.map(file_crc, paths)):
+            if crc != entry.crc:
+                damaged[path] = Damage(entry, "CRC differs")
+    return damaged
+
+
+def repair_install(dest, damaged, installers, workers=1):
+    """Extract the files found by verify_install from the installers that
+    wrote them and record them in the manifest again.
+
+    installers maps installer basenames to the paths of local copies.
+    Returns the repaired entries and those whose installer isn't there.
+    """
+    dest = os.path.abspath(dest)
+    by_installer = {}
+    for damage in damaged.values():
+        by_installer.setdefault(damage.entry.installer, []).append(damage.entry)
+
+    installed = manifest.read_manifest(dest)
+    repaired = []
+    unavailable = []
+    for installer_name, entries in by_installer.items():
+        installer = installers.get(installer_name)
+        if installer is None:
+            unavailable.extend(entries)
+            continue
+        found = []
+        with zipfile.ZipFile(installer) as archive:
+            for entry in entries:
+                name = GAME_FILES_PREFIX + entry.path
+                try:
+                    found.append((entry, archive.getinfo(name)))
+                except KeyError:
+                    unavailable.append(entry)
+        logger.info("Repairing %d files from %s", len(found), installer)
+        write_members(installer, dest, [info for _, info in found], workers)
+        for entry, info in found:
+            path = os.path.join(dest, entry.path)
+            installed[entry.path] = entry._replace(
+                size=info.file_size, crc=info.CRC, mode=member_mode(info),
+                mtime_ns=os.lstat(path).st_mtime_ns
+            )
+            repaired.append(installed[entry.path])
+    manifest.write_manifest(dest, installed.values())
+    return repaired, unavailable
@@ -1,15 +1,119 @@
 import logging
+import re
+import subprocess
+import sys
+from collections import defaultdict
 
 from gogtool.util import run_command
 
 logger = logging.getLogger(__name__)
 
+LGOG_COMMAND = 'lgogdownloader'
+ERROR_RE = re.compile(r'fail|error', re.IGNORECASE)
+
+
+class DownloadResult:
+    """Output lines of one game in a batched lgogdownloader run."""
+
+    def __init__(self, game_name):
+        self.game_name = game_name
+        self.lines = []
+        self.errors = []
+
+    def __repr__(self):
+        class_name = type(self).__name__
+        return f"{class_name}({self.game_name}, ok={self.ok})"
+
+    @property
+    def ok(self):
+        return not self.errors
+
 
 def run(command_string):
     command_args = command_string.split()
-    run_command(['lgogdownloader'] + command_args)
+    run_command([LGOG_COMMAND] + command_args)
+
+
+def download_command(game_name, dest, platform='l'):
+    return [
+        LGOG_COMMAND,
+        '--download',
+        '--directory', dest,
+        '--platform', platform,
+        '--game', game_name,
+    ]
 
 
 def download(game_name, dest, platform='l'):
     print(f"Downloading {game_name}...")
-    run(f"--download --directory {dest} --platform {platform} --game {game_name }")
+    run_command(download_command(game_name, dest, platform))
+
+
+def game_pattern(game_names):
+    """Regex for --game that matches exactly the given game names."""
+    # Longest first, so a name isn't shadowed by one of its prefixes
+    names = sorted(game_names, key=len, reverse=True)
+    return '^({})$'.format('|'.join(re.escape(n) for n in names))
+
+
+def batch_download_command(game_names, dest, platform='l'):
+    return download_command(game_pattern(game_names), dest, platform)
+
+
+def parse_download_output(lines, game_names):
+    """Assign lgogdownloader output lines to the games they mention."""
+    results = {name: DownloadResult(name) for name in game_names}
+    names = sorted(game_names, key=len, reverse=True)
+    name_re = re.compile(r'\b({})\b'.format('|'.join(re.escape(n) for n in names)))
+    for line in lines:
+        line = line.strip()
+        match = name_re.search(line)
+        if not line or match is None:
+            continue
+        result = results[match.group(1)]
+        result.lines.append(line)
+        if ERROR_RE.search(line):
+            result.errors.append(line)
+    return results
+
+
+def check_returncode(results, returncode):
+    """Count games without any output as failed if lgogdownloader failed."""
+    if returncode == 0:
+        return
+    for result in results.values():
+        if not result.lines:
+            result.errors.append(f"{LGOG_COMMAND} exited with {returncode}")
+
+
+def passthrough(stream):
+    """Echo the output of a process and yield it line by line."""
+    for raw_line in stream:
+        sys.stdout.buffer.write(raw_line)
+        sys.stdout.buffer.flush()
+        # Progress updates are separated by carriage returns
+        yield from raw_line.decode('utf-8', 'replace').split('\r')
+
+
+def download_batch(games, dest):
+    """Download several games with one lgogdownloader run per platform.
+
+    games is an iterable of (game name, platform) pairs. The output is
+    passed through and returned as DownloadResult per game name.
+    """
+    by_platform = defaultdict(list)
+    for game_name, platform in games:
+        by_platform[platform].append(game_name)
+
+    results = {}
+    for platform, game_names in sorted(by_platform.items()):
+        print(f"Downloading {', '.join(game_names)}...")
+        command = batch_download_command(game_names, dest, platform)
+        logger.debug("Running %s", " ".join(command))
+        process = subprocess.Popen(command, stdout=subprocess.PIPE)
+        batch_results = parse_download_output(
+            passthrough(process.stdout), game_names
+        )
+        check_returncode(batch_results, process.wait())
+        results.update(batch_results)
+    return results
@@ -1,26 +1,42 @@
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from operator import attrgetter, itemgetter
 
 from gogtool import gogdb
+from gogtool import hashcache
+from gogtool import lgog
+from gogtool import orphans
 from gogtool import util
 from gogtool.game import Game
+from gogtool.pipeline import InstallPipeline
+from gogtool.scheduler import LOG_DIR, DownloadScheduler
+from gogtool.verify import STATUS_CORRUPT, STATUS_OK, Verifier
 
 logger = logging.getLogger(__name__)
 
 
 class Library:
-    def __init__(self, gog_library, config):
+    def __init__(self, gog_library, config, state=None):
         self.gog_library = gog_library
         self.config = config
-        self.gog_db = gogdb.GOGDB()
+        self.state = state
+        self._gog_db = None
+        self._hash_cache = None
 
         self.download_dir = config['download_dir']
         self.install_dir = config['install_dir']
+        self.scan_workers = config.get('scan_workers', 8)
+        self.extract_workers = config.get('extract_workers', 4)
+        self.delete_workers = config.get('delete_workers', 8)
         self.gog_games = sorted(
             [g for g in gog_library['games']], key=itemgetter('gamename')
         )
+        self._game_data = {g['gamename']: g for g in self.gog_games}
+        # Directory names can be either the game name or the title
+        self._dir_names = {g['title']: g['gamename'] for g in self.gog_games}
+        self._dir_names.update((name, name) for name in self._game_data)
         self._games = {}
 
         self.scan_download_dir()
@@ -30,6 +46,39 @@ class Library:
         class_name = type(self).__name__
         return f"{class_name}({type(self).is_outdated()})"
 
+    @property
+    def gog_db(self):
+        # Only needed for image urls, so don't touch the network before that
+        if self._gog_db is None:
+            refresh_hours = self.config.get('gogdb_refresh_interval', 24)
+            try:
+                self._gog_db = gogdb.GOGDB(
+                    offline=self.config.get('gogdb_offline', False),
+                    cache_dir=self.config.get('cache_dir'),
+                    refresh_interval=refresh_hours * 3600
+                )
+            except gogdb.GOGDBError as e:
+                logger.warning("gogdb not available: %s", e)
+                self._gog_db = False
+        return self._gog_db
+
+    @property
+    def hash_cache(self):
+        """Content hashes of setup files, None without a cache dir."""
+        cache_dir = self.config.get('cache_dir')
+        if self._hash_cache is None and cache_dir is not None:
+            self._hash_cache = hashcache.HashCache(
+                os.path.join(cache_dir, hashcache.HASH_CACHE_FILE)
+            )
+        return self._hash_cache
+
+    @property
+    def download_log_dir(self):
+        cache_dir = self.config.get('cache_dir')
+        if cache_dir is None:
+            return None
+        return os.path.join(cache_dir, LOG_DIR)
+
     def get_all_games(self):
         return (self.get_game(g['gamename']) for g in self.gog_games)
 
@@ -56,13 +105,21 @@ class Library:
     def outdated_games(self):
         return [g for g in self.local_games if g.needs_update]
 
+    def scandir(self, dirpath):
+        # Unchanged directories are served from the state store, if there is one
+        if self.state is not None:
+            return self.state.scandir(dirpath)
+        return util.scandir(dirpath)
+
     def get_all_values(self, key):
         return [g[key] for g in self.gog_library['games']]
 
     def _get_game_data(self, game_name):
-        for game_data in self.gog_library['games']:
-            if game_data['gamename'] == game_name:
-                return game_data
+        return self._game_data.get(game_name)
+
+    def match_game_dir(self, dir_name):
+        """Return the name of the game a directory belongs to, or None."""
+        return self._dir_names.get(dir_name)
 
     def get_game(self, game_name, **kwargs):
         try:
@@ -71,9 +128,9 @@ class Library:
                 setattr(game, attr, value)
         except KeyError:
             game_data = self._get_game_data(game_name)
-            game = Game(game_data, **kwargs)
-            game_image_id = self.gog_db.get_game_img(game_name)
-            game.image_url = self.make_img_url(game_image_id)
+            game = Game(
+                game_data, image_resolver=self.get_image_url, **kwargs
+            )
             self._games[game_name] = game
         return game
 
@@ -83,13 +140,13 @@ class Library:
         )
         game_subdir_fmt = self.config['lgogdownloader']['subdir-game']
         logger.debug('Game subdir format is: %s', game_subdir_fmt)
-        game_names = self.get_all_values('gamename')
         for item in os.listdir(self.download_dir):
             item_path = os.path.join(self.download_dir, item)
             if game_subdir_fmt == '%gamename%':
-                if not (os.path.isdir(item_path) and item in game_names):
+                game_name = self.match_game_dir(item)
+                if game_name is None or not os.path.isdir(item_path):
                     continue
-                game = self.get_game(game_name=item, download_dir=item_path)
+                game = self.get_game(game_name=game_name, download_dir=item_path)
 
                 if game.has_dlc:
                     self.find_dlcs(game)
@@ -100,15 +157,12 @@ class Library:
         dlc_subdir_fmt = self.config['lgogdownloader']['subdir-dlc']
         dlc_subdir, dlc_id = dlc_subdir_fmt.split('/')
         dlc_dir = os.path.join(game.download_dir, dlc_subdir)
-        if not os.path.exists(dlc_dir):
-            return
-        for x in os.listdir(dlc_dir):
+        dlcs = {dlc.name: dlc for dlc in game.installable_dlcs}
+        for entry in self.scandir(dlc_dir):
             if dlc_id == '%dlcname%':
-                if x not in game.installable_dlcs:
+                if not (entry.name in dlcs and entry.is_dir()):
                     continue
-                dlc = game.installable_dlcs[x]
-                dlc.download_dir = os.path.join(dlc_dir, x)
-                dlc.downloaded_files = dlc.find_downloaded_files()
+                dlcs[entry.name].download_dir = entry.path
 
     def find_patches(self, game):
         pass
@@ -119,51 +173,160 @@ class Library:
         )
         game_subdir_fmt = self.config['lgogdownloader']['subdir-game']
         logger.debug('Game subdir format is: %s', game_subdir_fmt)
-        game_names = self.get_all_values('gamename')
-        for item in os.listdir(self.download_dir):
-            item_path = os.path.join(self.download_dir, item)
+        games = []
+        for entry in self.scandir(self.download_dir):
             if game_subdir_fmt == '%gamename%':
-                if not (os.path.isdir(item_path) and item in game_names):
+                game_name = self.match_game_dir(entry.name)
+                if game_name is None or not entry.is_dir():
                     continue
-                game = self.get_game(game_name=item, download_dir=item_path)
+                game = self.get_game(game_name=game_name, download_dir=entry.path)
+                games.append(game)
 
-                if game.has_dlc:
-                    self.find_dlcs(game)
+        # Reading the game directories is the slow part on network storage
+        with ThreadPoolExecutor(max_workers=self.scan_workers) as executor:
+            for _ in executor.map(self.scan_game_download_dir, games):
+                pass
 
         # TODO: look for patches
 
+    def scan_game_download_dir(self, game):
+        games = [game]
+        if game.has_dlc:
+            self.find_dlcs(game)
+            games.extend(game.installable_dlcs)
+        for g in games:
+            if g.download_dir is None:
+                continue
+            dir_content = self.scandir(g.download_dir)
+            g.downloaded_files = g.find_downloaded_files(dir_content)
+
     def scan_install_dir(self):
         logger.debug(
             "Looking for for installed games in: %s", self.install_dir
         )
-        game_names = self.get_all_values('gamename')
-        game_titles = self.get_all_values('title')
-        for item in os.listdir(self.install_dir):
-            item_path = os.path.join(self.install_dir, item)
-            for gn, gt in zip(game_names, game_titles):
-                if os.path.isdir(item_path) and item in (gn, gt):
-                    # Refer to games by 'gamename'
-                    self.get_game(game_name=gn, install_dir=item_path)
-                    break
+        for entry in self.scandir(self.install_dir):
+            # Refer to games by 'gamename'
+            game_name = self.match_game_dir(entry.name)
+            if game_name is None or not entry.is_dir():
+                continue
+            self.get_game(game_name=game_name, install_dir=entry.path)
 
     def download(self, game_name):
         logger.info("Downloading %s", game_name)
         game = self.get_game(game_name)
         game.download(self.download_dir)
 
+    def download_many(self, game_names):
+        """Download several games at once, see DownloadScheduler."""
+        if self.config.get('download_batch', False):
+            return self.download_batch(game_names)
+        scheduler = DownloadScheduler(
+            jobs=self.config.get('download_jobs', 2),
+            retries=self.config.get('download_retries', 1),
+            log_dir=self.download_log_dir
+        )
+        games = []
+        for game_name in game_names:
+            game = self.get_game(game_name)
+            if not game.prepare_download():
+                continue
+            logger.info("Downloading %s", game_name)
+            command = lgog.download_command(
+                game.name, dest=self.download_dir, platform=game.lgog_platform
+            )
+            scheduler.add(game.name, command)
+            games.append(game)
+
+        jobs = scheduler.run()
+        for game in games:
+            game.finish_download(self.download_dir)
+        if jobs:
+            print(scheduler.summary())
+        return jobs
+
+    def download_batch(self, game_names):
+        """Download several games with as few lgogdownloader runs as possible."""
+        games = [self.get_game(game_name) for game_name in game_names]
+        games = [game for game in games if game.prepare_download()]
+        results = lgog.download_batch(
+            ((game.name, game.lgog_platform) for game in games),
+            dest=self.download_dir
+        )
+        for game in games:
+            game.finish_download(self.download_dir)
+            result = results[game.name]
+            if not result.ok or not game.is_downloaded:
+                logger.error("Download of %s failed: %s", game.name, result.errors)
+                print(f"Download of '{game.name}' failed.")
+        return results
+
     def install(self, game_name):
         logger.info("Installing %s", game_name)
         game = self.get_game(game_name)
-        game.install(self.install_dir, self.download_dir)
+        game.install(self.install_dir, self.download_dir,
+                     extract_workers=self.extract_workers)
+
+    def install_many(self, game_names, pipelined=None):
+        """Install several games in parallel, see InstallPipeline."""
+        if pipelined is None:
+            pipelined = self.config.get('install_pipelined', False)
+        pipeline = InstallPipeline(
+            self,
+            workers=self.config.get('install_workers', 2),
+            pipelined=pipelined,
+            extract_workers=self.extract_workers
+        )
+        timings = pipeline.run(game_names)
+        if timings:
+            print(pipeline.summary())
+        return timings
+
+    def verify(self, game_names=None):
+        """Check the downloaded setup files of games and their DLCs for
+        corruption, of all downloaded games if game_names is None.
+        """
+        if game_names is None:
+            games = self.downloaded_games
+        else:
+            games = [self.get_game(game_name) for game_name in game_names]
+        files = []
+        for game in games:
+            for g in [game] + game.installable_dlcs:
+                files.extend((path, g.name) for path in sorted(g.downloaded_files))
+
+        verifier = Verifier(
+            os.path.expanduser(self.config.get(
+                'lgog_xml_dir', '~/.cache/lgogdownloader/xml'
+            )),
+            cache_dir=self.config.get('cache_dir'),
+            workers=self.config.get('verify_workers', 4),
+            hash_cache=self.hash_cache
+        )
+        results = verifier.verify(files)
+        for result in results:
+            if result.status == STATUS_CORRUPT:
+                logger.error("%s is corrupt: %s", result.path, result.detail)
+                print(f"Corrupt: {result.path} ({result.detail})")
+        ok = sum(r.status == STATUS_OK for r in results)
+        corrupt = sum(r.status == STATUS_CORRUPT for r in results)
+        print(f"{len(results)} files checked: {ok} ok, {corrupt} corrupt, "
+              f"{len(results) - ok - corrupt} without checksum")
+        return results
+
+    def verify_install(self, game_name, repair=False, full=False):
+        game = self.get_game(game_name)
+        return game.verify_install(
+            repair=repair, workers=self.extract_workers, full=full
+        )
 
     def update(self, game_name):
         game = self.get_game(game_name)
-        game.update()
+        game.update(self.download_dir, extract_workers=self.extract_workers)
 
-    def uninstall(self, game_name):
+    def uninstall(self, game_name, dry_run=False):
         logger.info("Uninstalling %s", game_name)
         game = self.get_game(game_name)
-        game.uninstall()
+        game.uninstall(dry_run=dry_run, workers=self.delete_workers)
 
     def delete_setup_files(self, game_name):
         game = self.get_game(game_name)
@@ -185,19 +348,49 @@ class Library:
         game.run()
 
     def check_orphaned(self):
-        orphans = []
-        for game in self.downloaded_games:
-            current, orphan = game.match_server_files()
-            if orphan:
-                orphans.extend(list(orphan))
-        return orphans
+        """Return the outdated setup files in the download dir."""
+        return list(orphans.scan_orphans(self))
 
     def delete_orphaned_files(self):
-        orphaned_files = self.check_orphaned()
-        for file_path in orphaned_files:
-            print(file_path)
-        if util.user_confirm("Delete orphaned files?"):
-            util.rm_all(orphaned_files)
+        orphaned_files = []
+        unknown_dirs = []
+        for orphan in orphans.scan_orphans(self, unknown_dirs):
+            print(f"{util.format_size(orphan.size):>10}  {orphan.path}")
+            orphaned_files.append(orphan)
+        for path in unknown_dirs:
+            print(f"Unknown directory, skipped: {path}")
+        if not orphaned_files:
+            print("No orphaned files found.")
+            return
+
+        summary = orphans.summarize(orphaned_files)
+        for game_name, (count, size) in sorted(summary.items()):
+            print(f"{game_name:<40} {count:5} files {util.format_size(size):>10}")
+        total = sum(orphan.size for orphan in orphaned_files)
+        print(f"{len(orphaned_files)} orphaned files, "
+              f"{util.format_size(total)} can be freed")
+        if not util.user_confirm("Delete orphaned files?"):
+            return
+
+        removed = util.unlink_many(
+            [orphan.path for orphan in orphaned_files],
+            workers=self.delete_workers
+        )
+        logger.info("Deleted %d orphaned files", removed)
+        for game_name in summary:
+            game = self._games.get(game_name)
+            if game is None:
+                continue
+            for g in [game] + game.installable_dlcs:
+                g.invalidate()
+
+    def get_image_url(self, game_name):
+        if not self.gog_db:
+            return None
+        game_image_id = self.gog_db.get_game_img(game_name)
+        if game_image_id is None:
+            return None
+        return self.make_img_url(game_image_id)
 
     def make_img_url(self, image_id):
         host_num = hash(image_id) % 4 + 1
@@ -1,11 +1,13 @@
 import os
 
-from gogtool import lgog, util
+from gogtool import lgog, snapshot, util
 from gogtool.config import configure_gogtool
 from gogtool.info import (print_all, print_downloaded, print_installed,
                           print_outdated, print_stats)
 from gogtool.library import Library
 from gogtool.log import configure_logger
+from gogtool.state import STATE_FILE, StateStore
+from gogtool.watch import LibraryWatcher
 
 
 def initialize_gogtool(args):
@@ -20,14 +22,16 @@ def initialize_gogtool(args):
 
 
 def initialize_library(args, config, log_level='warning'):
-    gog_library = util.load_json(config['lgog_data_path'])
+    data_path = config['lgog_data_path']
+    gog_library = snapshot.load_library(data_path, config['cache_dir'])
     if not any([args.download, args.launch, args.edit_lgogconfig, args.view]):
         if Library.is_outdated(gog_library) or args.refresh:
             print("Updating library data...")
             lgog.run('--update-cache')
-            gog_library = util.load_json(config['lgog_data_path'])
+            gog_library = snapshot.load_library(data_path, config['cache_dir'])
 
-    return Library(gog_library, config)
+    state = StateStore(os.path.join(config['data_dir'], STATE_FILE))
+    return Library(gog_library, config, state=state)
 
 
 def get_games(library, category, linux_only):
@@ -53,35 +57,55 @@ def get_print_func(category):
     return print_funcs[category]
 
 
+def print_change(game):
+    if game.is_installed:
+        status = "installed"
+    elif game.is_downloaded:
+        status = "downloaded"
+    else:
+        status = "removed"
+    print(f"{game.name}: {status}")
+
+
+def watch_library(library):
+    watcher = LibraryWatcher(library, on_change=print_change)
+    print("Watching for changes, press Ctrl+C to stop...")
+    try:
+        watcher.run()
+    finally:
+        watcher.stop()
+
+
 def run_gogtool(config, library, args, cli=False):
     if args.download:
         if len(args.download) == 1:
             game_name = args.download[0]
             library.download(game_name)
         else:
-            for game_name in args.download:
-                library.download(game_name)
+            library.download_many(args.download)
 
     if args.install:
         if len(args.install) == 1:
             game_name = args.install[0]
             library.install(game_name)
         else:
-            for game_name in args.install:
-                library.install(game_name)
+            library.install_many(args.install, pipelined=args.pipeline or None)
 
     if args.update:
         game_name = args.update
-        installers = library.update(game_name)
-        print(installers)
+        library.update(game_name)
+
+    if args.verify is not None:
+        library.verify(args.verify or None)
+
+    if args.verify_install:
+        library.verify_install(
+            args.verify_install, repair=args.repair, full=args.full
+        )
 
     if args.uninstall:
-        if len(args.uninstall) == 1:
-            game_name = args.uninstall[0]
-            library.uninstall(game_name)
-        else:
-            for game_name in args.uninstall:
-                library.uninstall(game_name)
+        for game_name in args.uninstall:
+            library.uninstall(game_name, dry_run=args.dry_run)
 
     if args.remove:
         if len(args.remove) == 1:
@@ -122,3 +146,6 @@ def run_gogtool(config, library, args, cli=False):
 
     if args.launch:
         library.run(game_name=args.launch)
+
+    if args.watch:
+        watch_library(library)
@@ -0,0 +1,52 @@
+import json
+import logging
+import os
+import tempfile
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'gogtool-manifest.jsonl'
+
+# path is relative to the install dir, mode the file mode from the zip,
+# installer the basename of the installer that wrote the file, origin
+# the name of its game or DLC and mtime_ns the mtime after writing it
+Entry = namedtuple('Entry', 'path size crc mode installer origin mtime_ns')
+Entry.__new__.__defaults__ = (None, None, None, None)
+
+
+def manifest_path(install_dir):
+    return os.path.join(install_dir, MANIFEST_FILE)
+
+
+def read_manifest(install_dir):
+    """Return the files installed in install_dir by path, {} if unknown."""
+    entries = {}
+    try:
+        with open(manifest_path(install_dir)) as f:
+            for line in f:
+                entry = Entry(**json.loads(line))
+                entries[entry.path] = entry
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def write_manifest(install_dir, entries):
+    """Replace the manifest of install_dir with entries.
+
+    The manifest is written to a temporary file first, so an interrupted
+    extraction leaves the previous manifest intact.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=install_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        for entry in entries:
+            f.write(json.dumps(entry._asdict()) + '\n')
+    os.replace(temp_path, manifest_path(install_dir))
+
+
+def remove_manifest(install_dir):
+    try:
+        os.unlink(manifest_path(install_dir))
+    except FileNotFoundError:
+        pass
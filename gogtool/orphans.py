@@ -0,0 +1,87 @@
+import logging
+from collections import namedtuple
+
+from gogtool import util
+from gogtool.game import SETUP_FILE_RE
+
+logger = logging.getLogger(__name__)
+
+# game is the name of the game the file belongs to
+Orphan = namedtuple('Orphan', 'path size game')
+
+
+def server_files(game):
+    """Return the setup file names on the server of a game and its DLCs,
+    by game or DLC name.
+    """
+    files = {game.name: {inst.basename for inst in game.server_installers}}
+    for dlc in game.installable_dlcs:
+        files[dlc.name] = {inst.basename for inst in dlc.server_installers}
+    return files
+
+
+def scan_setup_files(dirpath, current, game_name, subdirs=None):
+    """Yield the setup files in dirpath that are not in current. Directory
+    entries named in subdirs are collected there instead.
+    """
+    for entry in util.scandir(dirpath):
+        if entry.is_dir(follow_symlinks=False):
+            if subdirs is not None:
+                subdirs[entry.name] = entry.path
+            continue
+        if entry.name in current or not SETUP_FILE_RE.search(entry.name):
+            continue
+        try:
+            size = entry.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            continue
+        yield Orphan(entry.path, size, game_name)
+
+
+def scan_orphans(library, unknown_dirs=None):
+    """Yield setup files in the download dir that are not the latest ones
+    of their game or DLC, as soon as they are found.
+
+    Every game directory and DLC directory is read once. Directories that
+    don't belong to any game of the library are never scanned; their paths
+    are appended to unknown_dirs if given.
+    """
+    lgog_config = library.config['lgogdownloader']
+    if lgog_config['subdir-game'] != '%gamename%':
+        logger.warning("Game directories can't be matched with subdir-game "
+                       "%s, not looking for orphans", lgog_config['subdir-game'])
+        return
+    dlc_subdir, dlc_id = lgog_config['subdir-dlc'].split('/')
+
+    for entry in util.scandir(library.download_dir):
+        if not entry.is_dir():
+            continue
+        game_name = library.match_game_dir(entry.name)
+        if game_name is None:
+            logger.debug("Unknown directory in download dir: %s", entry.name)
+            if unknown_dirs is not None:
+                unknown_dirs.append(entry.path)
+            continue
+        current = server_files(library.get_game(game_name))
+
+        subdirs = {}
+        yield from scan_setup_files(
+            entry.path, current[game_name], game_name, subdirs
+        )
+        if dlc_subdir not in subdirs or dlc_id != '%dlcname%':
+            continue
+        for dlc_entry in util.scandir(subdirs[dlc_subdir]):
+            # Directories of DLCs not in the library are left alone as well
+            if dlc_entry.is_dir() and dlc_entry.name in current:
+                yield from scan_setup_files(
+                    dlc_entry.path, current[dlc_entry.name], game_name
+                )
+
+
+def summarize(orphans):
+    """Return {game: (number of files, bytes)} of orphans."""
+    summary = {}
+    for orphan in orphans:
+        count, size = summary.get(orphan.game, (0, 0))
+        summary[orphan.game] = (count + 1, size + orphan.size)
+    return summary
@@ -0,0 +1,82 @@
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from gogtool import installer
+
+logger = logging.getLogger(__name__)
+
+
+def install_game(game_name, tasks, extract_workers=1):
+    """Extract the installers of a game in order. Runs in a worker process."""
+    start = time.perf_counter()
+    for installer_path, dest, origin in tasks:
+        installer.extract_linux_installer(
+            installer_path, dest, workers=extract_workers, origin=origin
+        )
+    return game_name, time.perf_counter() - start
+
+
+class InstallPipeline:
+    """Install several games in parallel on a process pool.
+
+    All installers of a game run in one task, so DLCs are always extracted
+    after their base game. Games are downloaded first if necessary: all of
+    them at once before extracting starts, or, if pipelined, one after the
+    other while the games downloaded before them are being extracted.
+    """
+
+    def __init__(self, library, workers=2, pipelined=False, extract_workers=1):
+        self.library = library
+        self.workers = max(1, workers)
+        self.pipelined = pipelined
+        self.extract_workers = extract_workers
+        self.timings = {}
+
+    def run(self, game_names):
+        games = [self.library.get_game(game_name) for game_name in game_names]
+        games = [game for game in games if game.prepare_install()]
+
+        if not self.pipelined:
+            to_download = [game.name for game in games if game.needs_download]
+            if to_download:
+                self.library.download_many(to_download)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {}
+            for game in games:
+                if self.pipelined and game.needs_download:
+                    self.library.download(game.name)
+                if not game.is_downloaded:
+                    logger.error("%s could not be downloaded", game.name)
+                    self.timings[game.name] = None
+                    continue
+                logger.info("Installing %s", game.name)
+                tasks = game.install_tasks(self.library.install_dir)
+                future = executor.submit(
+                    install_game, game.name, tasks, self.extract_workers
+                )
+                futures[future] = game
+
+            for future in as_completed(futures):
+                game = futures[future]
+                try:
+                    game_name, seconds = future.result()
+                except Exception as e:
+                    logger.error("Installing %s failed: %s", game.name, e)
+                    print(f"Installing '{game.name}' failed: {e}")
+                    self.timings[game.name] = None
+                    continue
+                game.finish_install(self.library.install_dir)
+                self.timings[game_name] = seconds
+                print(f"Installed '{game_name}' in {seconds:.1f} s")
+
+        return self.timings
+
+    def summary(self):
+        installed = {n: t for n, t in self.timings.items() if t is not None}
+        lines = [f"{len(installed)} of {len(self.timings)} games installed"]
+        for game_name, seconds in sorted(self.timings.items()):
+            status = f"{seconds:7.1f} s" if seconds is not None else "failed"
+            lines.append(f"  {game_name:<25} {status}")
+        return "\n".join(lines)
@@ -0,0 +1,144 @@
+import logging
+import os
+import queue
+import subprocess
+import threading
+import time
+
+from gogtool.config import DEFAULT_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+LOG_DIR = 'download-logs'
+
+
+class DownloadJob:
+    def __init__(self, name, command):
+        self.name = name
+        self.command = command
+        self.attempts = 0
+        self.returncode = None
+        self.duration = 0.0
+        self.log_file = None
+
+    def __repr__(self):
+        class_name = type(self).__name__
+        return f"{class_name}({self.name})"
+
+    @property
+    def succeeded(self):
+        return self.returncode == 0
+
+
+class DownloadScheduler:
+    """Run download commands concurrently with a bounded number of processes.
+
+    Jobs are taken from a shared queue by `jobs` worker threads. A failed
+    job is put at the back of the queue until it has been tried
+    `retries + 1` times, so other games don't wait for it. The output of
+    each process goes to its own log file in log_dir, which is kept only
+    if the download failed.
+    """
+
+    def __init__(self, jobs=2, retries=1, retry_delay=5, log_dir=None,
+                 progress=None):
+        self.jobs = max(1, jobs)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.log_dir = log_dir or os.path.join(DEFAULT_CACHE_DIR, LOG_DIR)
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.progress = progress or self.print_progress
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.all_jobs = []
+        self.running = set()
+        self.finished = []
+
+    def add(self, name, command):
+        job = DownloadJob(name, command)
+        job.log_file = os.path.join(self.log_dir, f'{name}.log')
+        self.all_jobs.append(job)
+        self._queue.put(job)
+        return job
+
+    def run(self):
+        workers = [
+            threading.Thread(target=self.worker, daemon=True)
+            for _ in range(min(self.jobs, len(self.all_jobs)))
+        ]
+        for worker in workers:
+            worker.start()
+        self._queue.join()
+        return self.all_jobs
+
+    def worker(self):
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self.run_job(job)
+            finally:
+                self._queue.task_done()
+
+    def run_job(self, job):
+        if job.attempts > 0 and self.retry_delay:
+            time.sleep(self.retry_delay)
+        job.attempts += 1
+        with self._lock:
+            self.running.add(job.name)
+        self.progress(self, job, 'started')
+
+        start = time.perf_counter()
+        logger.debug("Running %s", " ".join(job.command))
+        try:
+            # Start a fresh log, retries are appended to it
+            mode = 'wb' if job.attempts == 1 else 'ab'
+            with open(job.log_file, mode) as log:
+                job.returncode = subprocess.call(
+                    job.command,
+                    stdin=subprocess.DEVNULL,
+                    stdout=log,
+                    stderr=subprocess.STDOUT
+                )
+        except OSError as e:
+            logger.error("Could not run %s: %s", job.command[0], e)
+            job.returncode = -1
+        job.duration += time.perf_counter() - start
+
+        with self._lock:
+            self.running.discard(job.name)
+            retry = not job.succeeded and job.attempts <= self.retries
+            if not retry:
+                self.finished.append(job)
+        if retry:
+            logger.warning("Download of %s failed, retrying", job.name)
+            self.progress(self, job, 'retrying')
+            self._queue.put(job)
+        else:
+            if job.succeeded:
+                os.remove(job.log_file)
+            self.progress(self, job, 'done' if job.succeeded else 'failed')
+
+    @staticmethod
+    def print_progress(scheduler, job, status):
+        with scheduler._lock:
+            done = len(scheduler.finished)
+            running = len(scheduler.running)
+        total = len(scheduler.all_jobs)
+        print(f"[{done}/{total}, {running} running] {job.name}: {status}")
+
+    def summary(self):
+        succeeded = [j for j in self.all_jobs if j.succeeded]
+        failed = [j for j in self.all_jobs if not j.succeeded]
+        lines = [f"{len(succeeded)} of {len(self.all_jobs)} downloads succeeded"]
+        for job in self.all_jobs:
+            status = "ok" if job.succeeded else "failed"
+            lines.append(
+                f"  {job.name:<25} {status:<6} {job.duration:7.1f} s, "
+                f"{job.attempts} attempt(s)"
+            )
+        for job in failed:
+            lines.append(f"see {job.log_file} for the output of {job.name}")
+        return "\n".join(lines)
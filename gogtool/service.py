@@ -0,0 +1,182 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+from gogtool.browser import Args
+from gogtool.config import configure_gogtool
+from gogtool.log import configure_logger
+from gogtool.main import initialize_library, run_gogtool
+from gogtool.watch import LibraryWatcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_INTERVAL = 300
+
+
+class LibraryService:
+    """One Library for the lifetime of a long running front end.
+
+    The configuration and library are loaded on first use and then shared,
+    instead of being rebuilt for every request. All access goes through
+    library(), which holds a lock, so requests and background updates
+    don't interfere. Long commands like downloads and installs are run
+    with submit() on a worker thread without holding the lock, and the
+    library is reloaded when they are done; launch() starts a game on its
+    own thread. invalidate() makes the next access reload the library,
+    refresh() reloads it right away, and start() keeps it current with a
+    LibraryWatcher and a periodic refresh in the background.
+
+    loader returns a new Library; by default it is built like the command
+    line does. refresh_interval is in seconds, 0 disables the periodic
+    refresh.
+    """
+
+    def __init__(self, args=None, config=None, loader=None,
+                 refresh_interval=None, watch=True):
+        self.args = args or Args()
+        if config is None:
+            log_file = os.path.join(os.getcwd(), 'gogtool.log')
+            configure_logger(self.args.debug, log_file)
+            config = configure_gogtool()
+        self.config = config
+        self.loader = loader or partial(initialize_library, self.args, config)
+        if refresh_interval is None:
+            refresh_interval = config.get(
+                'library_refresh_interval', DEFAULT_REFRESH_INTERVAL
+            )
+        self.refresh_interval = refresh_interval
+        self.watch = watch
+
+        self.lock = threading.RLock()
+        # Serializes loading, which happens outside of lock
+        self._load_lock = threading.Lock()
+        self._library = None
+        self._watcher = None
+        self._stale = True
+        self._stop = threading.Event()
+        self._thread = None
+        # Runs one long command at a time
+        self._jobs = ThreadPoolExecutor(max_workers=1,
+                                        thread_name_prefix='gogtool-job')
+        self.loaded_at = None
+
+    def _load(self):
+        """Build a new library and swap it in for the current one."""
+        with self._load_lock:
+            self._swap_in_new_library()
+
+    def _load_if_stale(self):
+        with self._load_lock:
+            if self._stale:
+                self._swap_in_new_library()
+
+    def _swap_in_new_library(self):
+        start = time.perf_counter()
+        library = self.loader()
+        watcher = None
+        if self.watch:
+            try:
+                watcher = LibraryWatcher(library, lock=self.lock)
+                watcher.start()
+            except OSError as e:
+                logger.warning("Not watching the library: %s", e)
+        logger.info("Library loaded in %.2f s", time.perf_counter() - start)
+
+        with self.lock:
+            old = self._library, self._watcher
+            self._library, self._watcher = library, watcher
+            self._stale = False
+            self.loaded_at = time.time()
+        self._close(*old)
+
+    @staticmethod
+    def _close(library, watcher):
+        if watcher is not None:
+            watcher.stop()
+        if library is not None and library.state is not None:
+            library.state.close()
+
+    @contextmanager
+    def library(self):
+        """Hold the lock and yield the current library, loading it first
+        if there is none or it was invalidated.
+        """
+        self._load_if_stale()
+        with self.lock:
+            yield self._library
+
+    def run(self, args):
+        """Run a short gogtool command on the shared library while holding
+        the lock, see run_gogtool.
+        """
+        with self.library() as library:
+            return run_gogtool(self.config, library, args, cli=False)
+
+    def launch(self, game_name):
+        """Start a game on its own thread and return the thread. The lock
+        is only held to look up the game, not while it is running.
+        """
+        with self.library() as library:
+            game = library.get_game(game_name)
+        logger.info("Launching %s", game_name)
+        thread = threading.Thread(target=game.run, daemon=True)
+        thread.start()
+        return thread
+
+    def submit(self, args):
+        """Run a long gogtool command on the worker thread and return its
+        Future. Requests can use the library while it runs.
+        """
+        return self._jobs.submit(self._run_job, args)
+
+    def _run_job(self, args):
+        # The lock is only needed to get the current library
+        with self.library() as library:
+            pass
+        try:
+            return run_gogtool(self.config, library, args, cli=False)
+        finally:
+            # Pick up the installed or downloaded files from disk
+            self.invalidate()
+
+    def invalidate(self):
+        """Reload the library on the next access."""
+        with self.lock:
+            self._stale = True
+
+    def refresh(self):
+        """Reload the library now. Requests keep using the current one
+        until the new one is ready.
+        """
+        self._load()
+
+    def start(self):
+        """Load the library and refresh it periodically in the background."""
+        self._load_if_stale()
+        if self.refresh_interval and self._thread is None:
+            self._thread = threading.Thread(target=self._refresh_loop,
+                                            daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Refreshing the library failed")
+
+    def stop(self):
+        self._stop.set()
+        self._jobs.shutdown(wait=True)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self.lock:
+            old = self._library, self._watcher
+            self._library = self._watcher = None
+            self._stale = True
+        self._close(*old)
@@ -0,0 +1,70 @@
+import logging
+import os
+import pickle
+import tempfile
+
+from gogtool import util
+from gogtool.game import normalize_game_data
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = 'library.pickle'
+SNAPSHOT_VERSION = 2
+
+
+def snapshot_key(data_path):
+    stat = os.stat(data_path)
+    return (
+        SNAPSHOT_VERSION,
+        os.path.abspath(data_path),
+        stat.st_mtime_ns,
+        stat.st_size,
+    )
+
+
+def build_library(data_path):
+    logger.debug("Parsing library data: %s", data_path)
+    return util.load_json_streamed(data_path, 'games', normalize_game_data)
+
+
+def read_snapshot(snapshot_path, key):
+    try:
+        with open(snapshot_path, 'rb') as f:
+            # The key is pickled separately, so a stale snapshot is
+            # rejected without loading the library itself
+            if pickle.load(f) != key:
+                return None
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except (pickle.UnpicklingError, EOFError, AttributeError, ValueError) as e:
+        logger.warning("Discarding unreadable library snapshot: %s", e)
+        return None
+
+
+def write_snapshot(snapshot_path, key, gog_library):
+    snapshot_dir = os.path.dirname(snapshot_path)
+    util.mkdir(snapshot_dir)
+    fd, temp_path = tempfile.mkstemp(dir=snapshot_dir, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(key, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(gog_library, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, snapshot_path)
+
+
+def load_library(data_path, cache_dir):
+    """Load lgogdownloader's library data, normalized by normalize_game_data.
+
+    The result is cached in cache_dir and reused as long as the modification
+    time and size of data_path don't change.
+    """
+    key = snapshot_key(data_path)
+    snapshot_path = os.path.join(cache_dir, SNAPSHOT_FILE)
+    gog_library = read_snapshot(snapshot_path, key)
+    if gog_library is not None:
+        logger.debug("Using library snapshot: %s", snapshot_path)
+        return gog_library
+
+    gog_library = build_library(data_path)
+    write_snapshot(snapshot_path, key, gog_library)
+    return gog_library
@@ -0,0 +1,147 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from gogtool import util
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = 'state.sqlite'
+# Listings of directories changed this recently are not trusted, since
+# another change within the same mtime tick would go unnoticed
+RACY_INTERVAL_NS = 2 * 10**9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (dir, name)
+);
+-- Per game state kept by earlier versions
+DROP TABLE IF EXISTS games;
+DROP TABLE IF EXISTS files;
+DROP TABLE IF EXISTS installed_dlcs;
+"""
+
+
+class Entry(namedtuple('Entry', 'name path dir size mtime_ns')):
+    """Stored directory entry, usable in place of os.DirEntry."""
+    __slots__ = ()
+
+    def is_dir(self):
+        return bool(self.dir)
+
+
+class StateStore:
+    """Persistent record of the local state of the library.
+
+    Directory listings are stored with the directory's mtime and only read
+    from disk again when it changes; the files in them are still stat'ed.
+    Library scans go through scandir(), so unchanged directories aren't
+    listed again.
+    """
+
+    def __init__(self, db_path):
+        util.mkdir(os.path.dirname(db_path))
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.db:
+            self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def scandir(self, dirpath):
+        """Like util.scandir, but reuses the stored listing if dirpath is unchanged."""
+        try:
+            mtime_ns = os.stat(dirpath).st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):
+            self.forget_dir(dirpath)
+            return []
+
+        with self.lock:
+            row = self.db.execute(
+                'SELECT mtime_ns FROM dirs WHERE path = ?', (dirpath,)
+            ).fetchone()
+            if row is not None and row[0] == mtime_ns:
+                rows = self.db.execute(
+                    'SELECT name, is_dir, size, mtime_ns FROM entries '
+                    'WHERE dir = ?', (dirpath,)
+                ).fetchall()
+            else:
+                rows = None
+        if rows is not None:
+            return self.refresh_entries(dirpath, rows)
+
+        logger.debug("Reading directory: %s", dirpath)
+        entries = []
+        for dir_entry in util.scandir(dirpath):
+            try:
+                stat = dir_entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append(Entry(
+                dir_entry.name,
+                dir_entry.path,
+                dir_entry.is_dir(),
+                stat.st_size,
+                stat.st_mtime_ns,
+            ))
+
+        if time.time_ns() - mtime_ns < RACY_INTERVAL_NS:
+            return entries
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM entries WHERE dir = ?', (dirpath,))
+            self.db.executemany(
+                'INSERT INTO entries VALUES (?, ?, ?, ?, ?)',
+                ((dirpath, e.name, e.dir, e.size, e.mtime_ns) for e in entries)
+            )
+            self.db.execute(
+                'INSERT OR REPLACE INTO dirs VALUES (?, ?)', (dirpath, mtime_ns)
+            )
+        return entries
+
+    def refresh_entries(self, dirpath, rows):
+        """Return stored entries of an unchanged directory. Files can be
+        written in place without changing the directory's mtime, so their
+        size and mtime are read again.
+        """
+        entries = []
+        changed = []
+        for name, is_dir, size, mtime_ns in rows:
+            entry = Entry(name, os.path.join(dirpath, name), is_dir, size, mtime_ns)
+            if not is_dir:
+                try:
+                    stat = os.stat(entry.path)
+                except FileNotFoundError:
+                    continue
+                if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                    entry = entry._replace(
+                        size=stat.st_size, mtime_ns=stat.st_mtime_ns
+                    )
+                    changed.append(entry)
+            entries.append(entry)
+        if changed:
+            with self.lock, self.db:
+                self.db.executemany(
+                    'UPDATE entries SET size = ?, mtime_ns = ? '
+                    'WHERE dir = ? AND name = ?',
+                    ((e.size, e.mtime_ns, dirpath, e.name) for e in changed)
+                )
+        return entries
+
+    def forget_dir(self, dirpath):
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM dirs WHERE path = ?', (dirpath,))
+            self.db.execute('DELETE FROM entries WHERE dir = ?', (dirpath,))
@@ -3,13 +3,14 @@ import logging
 import os
 import shutil
 import subprocess
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
-
-def move(src, dest):
-    shutil.move(src, dest)
+JSON_CHUNK_SIZE = 1024 * 1024
+# Characters that can continue a JSON number
+JSON_NUMBER_CHARS = frozenset('0123456789+-.eE')
+UNLINK_BATCH_SIZE = 512
 
 
 def rm(filepath):
@@ -32,25 +33,65 @@ def rmdir(dirpath):
     shutil.rmtree(dirpath)
 
 
+def unlink_batch(paths):
+    removed = 0
+    for path in paths:
+        try:
+            os.unlink(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def unlink_many(paths, workers=1):
+    """Delete files in batches, on a thread pool if workers > 1.
+
+    Missing files are skipped. Return the number of files deleted.
+    """
+    paths = list(paths)
+    batches = [
+        paths[i:i + UNLINK_BATCH_SIZE]
+        for i in range(0, len(paths), UNLINK_BATCH_SIZE)
+    ]
+    logger.debug("Deleting %d files in %d batches", len(paths), len(batches))
+    if workers <= 1 or len(batches) <= 1:
+        return sum(map(unlink_batch, batches))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(unlink_batch, batches))
+
+
+def prune_empty_dirs(dirs, root):
+    """Remove dirs and their parents below root, deepest first, as long as
+    they are empty. Return the number of directories removed.
+    """
+    removed = 0
+    for dirpath in sorted(set(dirs), key=lambda d: d.count(os.sep), reverse=True):
+        while dirpath.startswith(root + os.sep):
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                break
+            removed += 1
+            dirpath = os.path.dirname(dirpath)
+    return removed
+
+
+def format_size(num_bytes):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if num_bytes < 1024:
+            break
+        num_bytes /= 1024
+    else:
+        unit = 'TiB'
+    return f"{num_bytes:.1f} {unit}" if unit != 'B' else f"{num_bytes} B"
+
+
 def mkdir(dirpath):
     logger.debug("Creating directory: %s", dirpath)
     os.makedirs(dirpath, exist_ok=True)
 
 
-def update_dir(src, dest):
-    logger.debug("Updating directory: %s (from %s)", dest, src)
-    for src_dir, sub_dir, files in os.walk(src):
-        dest_dir = src_dir.replace(src, dest, 1)  # Equivalent of src in dest
-        if not os.path.exists(dest_dir):
-            mkdir(dest_dir)
-        for file_ in files:
-            src_file = os.path.join(src_dir, file_)
-            dest_file = os.path.join(dest_dir, file_)
-            if os.path.exists(dest_file):
-                rm(dest_file)
-            move(src_file, dest_dir)
-
-
 def run_command(args, shell=False, silent=False, ignore_errors=False):
     logger.debug("Running %s", " ".join(args))
     stderr_target = subprocess.DEVNULL if ignore_errors else None
@@ -103,44 +144,120 @@ def listdir(dirpath):
     return [os.path.join(dirpath, fp) for fp in os.listdir(dirpath)]
 
 
-def open_dir(dirpath):
-    run_command(['xdg-open', dirpath])
+def scandir(dirpath):
+    """Return the os.DirEntry objects of dirpath, or [] if it doesn't exist."""
+    try:
+        with os.scandir(dirpath) as it:
+            return list(it)
+    except (FileNotFoundError, NotADirectoryError):
+        return []
 
 
-def extract_linux_installer(installer, dest):
-    # Extract files into temp dir
-    mkdir(dest)
-    temp_dir = tempfile.mkdtemp(dir=dest)
-    extract_command = [
-        "unzip",
-        "-qq",              # quieter mode
-        installer,
-        "-d",               # destination
-        temp_dir,
-        "data/noarch/*"     # only extract files from this subdir
-    ]
-    run_command(extract_command, ignore_errors=True)
-
-    # Move files from temp dir to game folder
-    game_files_dir = os.path.join(temp_dir, "data/noarch")
-    update_dir(game_files_dir, dest)
-
-    rmdir(temp_dir)
-
-    # Save list of file names to text file (for uninstalling)
-    text_file = os.path.join(dest, "files.txt")
-    list_files_command = [
-        "unzip",
-        "-Z",               # zip info mode
-        "-1",               # listing format: filenames only
-        installer,
-        "data/noarch/*",
-        ">>",
-        text_file
-    ]
-    run_command(list_files_command, shell=True, ignore_errors=True)
+def open_dir(dirpath):
+    run_command(['xdg-open', dirpath])
 
 
 def load_json(filepath):
     with open(filepath) as fp:
         return json.load(fp)
+
+
+def dump_json(data, filepath):
+    with open(filepath, 'w') as fp:
+        json.dump(data, fp)
+
+
+class JSONStreamReader:
+    """Decode consecutive JSON values from a file without reading it whole."""
+
+    def __init__(self, fp, chunk_size=JSON_CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def read_more(self):
+        if self.eof:
+            raise json.JSONDecodeError(
+                "Unexpected end of file", self.buffer, self.pos
+            )
+        chunk = self.fp.read(self.chunk_size)
+        # Drop what has been consumed, so the buffer stays small
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        self.eof = not chunk
+
+    def next_char(self):
+        """Skip whitespace and return the next character without consuming it."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            self.read_more()
+
+    def expect(self, chars):
+        char = self.next_char()
+        if char not in chars:
+            raise json.JSONDecodeError(
+                f"Expected one of {chars!r}", self.buffer, self.pos
+            )
+        self.pos += 1
+        return char
+
+    def decode(self):
+        self.next_char()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # A value ending right at the buffer end might be cut off,
+                # and so might a number followed by more of a number
+                # ("-1." or "5e" decode as -1 and 5), unless there is
+                # nothing left to read
+                cut_off = end == len(self.buffer) or (
+                    isinstance(value, (int, float)) and
+                    self.buffer[end] in JSON_NUMBER_CHARS
+                )
+                if not cut_off or self.eof:
+                    self.pos = end
+                    return value
+            self.read_more()
+
+
+def load_json_streamed(filepath, array_key, transform,
+                       chunk_size=JSON_CHUNK_SIZE):
+    """Load a JSON object, streaming the array at array_key item by item.
+
+    Each item is passed through transform as soon as it is decoded, so only
+    one raw item is held in memory at a time.
+    """
+    with open(filepath) as fp:
+        reader = JSONStreamReader(fp, chunk_size)
+        data = {}
+        reader.expect('{')
+        if reader.next_char() == '}':
+            return data
+        while True:
+            key = reader.decode()
+            reader.expect(':')
+            if key == array_key:
+                items = []
+                reader.expect('[')
+                if reader.next_char() == ']':
+                    reader.expect(']')
+                else:
+                    while True:
+                        items.append(transform(reader.decode()))
+                        if reader.expect(',]') == ']':
+                            break
+                data[key] = items
+            else:
+                data[key] = reader.decode()
+            if reader.expect(',}') == '}':
+                return data
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import xml.etree.ElementTree as ElementTree
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+VERIFY_CACHE_FILE = 'verify.json'
+HASH_CHUNK_SIZE = 16 * 1024 * 1024
+
+STATUS_OK = 'ok'
+STATUS_CORRUPT = 'corrupt'
+STATUS_UNKNOWN = 'unknown'
+
+Result = namedtuple('Result', 'path status detail')
+
+
+def read_lgog_md5(xml_dir, game_name, path):
+    """Return the MD5 lgogdownloader recorded for a setup file of a game or
+    DLC, or None. lgogdownloader keeps one directory per game name.
+    """
+    if game_name is None:
+        return None
+    xml_path = os.path.join(xml_dir, game_name, os.path.basename(path) + '.xml')
+    try:
+        root = ElementTree.parse(xml_path).getroot()
+    except (FileNotFoundError, ElementTree.ParseError):
+        return None
+    return root.get('md5') or None
+
+
+def md5_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """MD5 of a file, hashed in chunks of a memory map of it."""
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return md5.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                memoryview(mapped) as view:
+            for offset in range(0, size, chunk_size):
+                md5.update(view[offset:offset + chunk_size])
+    return md5.hexdigest()
+
+
+def check_zip_crcs(path):
+    """Check the CRC32 of every member of a zip, or of the zip appended to
+    a GOG Linux installer. Return the name of the first bad member, or None.
+    """
+    with zipfile.ZipFile(path) as archive:
+        return archive.testzip()
+
+
+def verify_file(path, xml_dir, game_name=None, hash_func=md5_file):
+    md5 = read_lgog_md5(xml_dir, game_name, path)
+    if md5 is not None:
+        actual = hash_func(path)
+        if actual == md5:
+            return Result(path, STATUS_OK, "md5")
+        return Result(path, STATUS_CORRUPT, f"md5 {actual}, expected {md5}")
+
+    try:
+        bad_member = check_zip_crcs(path)
+    except zipfile.BadZipFile:
+        if path.endswith(('.sh', '.zip')):
+            return Result(path, STATUS_CORRUPT, "not a valid zip archive")
+        return Result(path, STATUS_UNKNOWN, "no checksum available")
+    if bad_member is not None:
+        return Result(path, STATUS_CORRUPT, f"bad CRC: {bad_member}")
+    return Result(path, STATUS_OK, "zip CRCs")
+
+
+class Verifier:
+    """Check downloaded setup files against lgogdownloader's MD5 data.
+
+    lgogdownloader keeps an XML file with the MD5 of each setup file it
+    downloaded in xml_dir/<game name>. Files without one are checked against the
+    CRC32s of their zip archive, which covers Linux installers. Results
+    are cached by path, size and modification time in cache_dir. MD5s
+    come from hash_cache, a HashCache, if given.
+    """
+
+    def __init__(self, xml_dir, cache_dir=None, workers=4, hash_cache=None):
+        self.xml_dir = xml_dir
+        self.workers = max(1, workers)
+        self.hash_func = hash_cache.hash if hash_cache is not None else md5_file
+        self.cache_path = None
+        self.cache = {}
+        self.lock = threading.Lock()
+        if cache_dir is not None:
+            self.cache_path = os.path.join(cache_dir, VERIFY_CACHE_FILE)
+            self.cache = self.load_cache()
+
+    def load_cache(self):
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_cache(self):
+        if self.cache_path is None:
+            return
+        cache_dir = os.path.dirname(self.cache_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.cache, f)
+        os.replace(temp_path, self.cache_path)
+
+    def verify_one(self, path, game_name=None):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return Result(path, STATUS_CORRUPT, "file not found")
+        key = [st.st_size, st.st_mtime_ns]
+        with self.lock:
+            cached = self.cache.get(path)
+        if cached is not None and cached[:2] == key:
+            return Result(path, *cached[2:])
+
+        logger.debug("Verifying %s", path)
+        try:
+            result = verify_file(path, self.xml_dir, game_name, self.hash_func)
+        except OSError as e:
+            return Result(path, STATUS_CORRUPT, str(e))
+        with self.lock:
+            self.cache[path] = key + [result.status, result.detail]
+        return result
+
+    def verify(self, files):
+        """Verify (path, game name) pairs on a thread pool and return their
+        Results. The game name is that of the game or DLC the file belongs to.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(lambda f: self.verify_one(*f), files))
+        self.save_cache()
+        return results
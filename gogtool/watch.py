@@ -0,0 +1,215 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Event masks from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+    IN_DELETE_SELF | IN_MOVE_SELF
+)
+IN_ADDED = IN_CREATE | IN_MOVED_TO
+IN_REMOVED = IN_DELETE | IN_MOVED_FROM
+
+EVENT_HEADER = struct.Struct('iIII')
+READ_SIZE = 64 * 1024
+
+
+class Inotify:
+    """Minimal inotify binding through libc."""
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            self.raise_errno()
+        self.paths = {}
+
+    def raise_errno(self, path=None):
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err), path)
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            self.raise_errno(path)
+        self.paths[wd] = path
+        return wd
+
+    def read_events(self, timeout=None):
+        """Wait up to timeout seconds and return (dir path, mask, name) tuples."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            path = self.paths.get(wd)
+            if mask & IN_IGNORED:
+                # The watch was removed, e.g. because the directory is gone
+                self.paths.pop(wd, None)
+            if path is not None:
+                events.append((path, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class LibraryWatcher:
+    """Keep the download and install state of a Library up to date.
+
+    Watches the download dir, the install dir and the directories of
+    downloaded games and their DLCs, and applies changes to the affected
+    games as they happen, instead of rescanning everything.
+    """
+
+    def __init__(self, library, on_change=None, lock=None):
+        self.library = library
+        self.on_change = on_change
+        self.lock = lock or threading.RLock()
+        self.inotify = Inotify()
+        self._thread = None
+        self._stop = threading.Event()
+        # Watched game directories: path -> game (or DLC)
+        self.game_dirs = {}
+        # DLC parent directories: path -> base game
+        self.dlc_dirs = {}
+
+        self.add_watch(library.download_dir)
+        self.add_watch(library.install_dir)
+        for game in library.downloaded_games:
+            self.watch_game(game)
+
+    def add_watch(self, path):
+        try:
+            self.inotify.add_watch(path)
+        except OSError as e:
+            if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+                raise
+            logger.debug("Can't watch %s: %s", path, e)
+            return False
+        return True
+
+    def watch_game(self, game):
+        if self.add_watch(game.download_dir):
+            self.game_dirs[game.download_dir] = game
+        if not game.has_dlc:
+            return
+        dlc_subdir = self.library.config['lgogdownloader']['subdir-dlc']
+        dlc_dir = os.path.join(game.download_dir, dlc_subdir.split('/')[0])
+        if self.add_watch(dlc_dir):
+            self.dlc_dirs[dlc_dir] = game
+        self.library.find_dlcs(game)
+        for dlc in game.installable_dlcs:
+            if dlc.download_dir and self.add_watch(dlc.download_dir):
+                self.game_dirs[dlc.download_dir] = dlc
+
+    def changed(self, game):
+        logger.debug("Changed: %s", game.name)
+        if self.on_change is not None:
+            self.on_change(game)
+
+    def handle_event(self, path, mask, name):
+        entry_path = os.path.join(path, name)
+        is_dir = mask & IN_ISDIR
+        if path == self.library.download_dir and is_dir:
+            self.handle_download_dir(entry_path, name, mask)
+        elif path == self.library.install_dir and is_dir:
+            self.handle_install_dir(entry_path, name, mask)
+        elif path in self.dlc_dirs and is_dir:
+            game = self.dlc_dirs[path]
+            self.library.find_dlcs(game)
+            for dlc in game.installable_dlcs:
+                if dlc.download_dir == entry_path:
+                    if self.add_watch(entry_path):
+                        self.game_dirs[entry_path] = dlc
+                    dlc.invalidate()
+                    self.changed(dlc)
+        elif path in self.game_dirs:
+            game = self.game_dirs[path]
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                del self.game_dirs[path]
+            if is_dir and mask & IN_ADDED and game.has_dlc:
+                # The DLC subdirectory appeared
+                self.watch_game(game)
+            game.invalidate()
+            self.changed(game)
+
+    def handle_download_dir(self, entry_path, name, mask):
+        game_name = self.library.match_game_dir(name)
+        if game_name is None:
+            return
+        if mask & IN_ADDED:
+            game = self.library.get_game(game_name, download_dir=entry_path)
+            self.watch_game(game)
+            # Files may have been written before the watch was in place
+            game.invalidate()
+        elif mask & IN_REMOVED:
+            game = self.library.get_game(game_name)
+            self.game_dirs.pop(entry_path, None)
+            game.download_dir = None
+        else:
+            return
+        self.changed(game)
+
+    def handle_install_dir(self, entry_path, name, mask):
+        game_name = self.library.match_game_dir(name)
+        if game_name is None:
+            return
+        game = self.library.get_game(game_name)
+        if mask & IN_ADDED:
+            game.install_dir = entry_path
+        elif mask & IN_REMOVED and game.install_dir == entry_path:
+            game.install_dir = None
+            game.dlc_installed = False
+        else:
+            return
+        self.changed(game)
+
+    def poll(self, timeout=None):
+        for path, mask, name in self.inotify.read_events(timeout):
+            with self.lock:
+                self.handle_event(path, mask, name)
+
+    def run(self):
+        """Apply changes until stop() is called."""
+        while not self._stop.is_set():
+            self.poll(timeout=0.5)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.inotify.close()
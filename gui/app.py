@@ -1,9 +1,29 @@
+import threading
+
 from flask import Flask, redirect, render_template, request, url_for
 
-from gogtool.browser import Args, main
+from gogtool import lgog
+from gogtool.browser import Args
+from gogtool.main import get_games
+from gogtool.service import LibraryService
 
 app = Flask(__name__)
 
+service = None
+service_lock = threading.Lock()
+
+
+def get_service():
+    """Return the library shared by all requests, loaded on first use and
+    kept up to date in the background.
+    """
+    global service
+    with service_lock:
+        if service is None:
+            service = LibraryService(Args(debug='debug'))
+            service.start()
+    return service
+
 
 @app.route('/')
 def home():
@@ -14,23 +34,21 @@ def home():
 def list_games(list_type='installed'):
     linux_only = request.args.get('linux_only')
     linux_only = {'True': True, 'False': False}.get(linux_only, True)
-    platform = 'l' if linux_only else 'w'
 
-    args = Args(list=list_type, debug='debug', platform=platform)
-    games = main(args)
-    return render_template(
-        'list.html',
-        list_type=list_type,
-        games=games,
-        linux_only=linux_only
-    )
+    with get_service().library() as library:
+        games = get_games(library, list_type, linux_only=linux_only)
+        return render_template(
+            'list.html',
+            list_type=list_type,
+            games=games,
+            linux_only=linux_only
+        )
 
 
 @app.route('/launch')
 def launch_game():
     game = request.args.get('game')
-    args = Args(launch=game)
-    main(args)
+    get_service().launch(game)
     return redirect(url_for('list_games', list_type='installed'))
 
 
@@ -38,7 +56,7 @@ def launch_game():
 def download_game():
     game = request.args.get('game')
     args = Args(download=[game])
-    main(args)
+    get_service().submit(args)
     return redirect(url_for('list_games', list_type='all'))
 
 
@@ -46,7 +64,7 @@ def download_game():
 def install_game():
     game = request.args.get('game')
     args = Args(install=[game])
-    main(args)
+    get_service().submit(args)
     return redirect(url_for('list_games', list_type='all'))
 
 
@@ -57,4 +75,6 @@ def lgog_edit_config():
 
 @app.route('/lgogdownloader/refresh')
 def lgog_refresh():
-    pass
+    lgog.run('--update-cache')
+    get_service().refresh()
+    return redirect(url_for('list_games', list_type='all'))
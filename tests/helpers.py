@@ -0,0 +1,56 @@
+"""Fixture data shared by the test modules."""
+import io
+import os
+import zipfile
+
+from gogtool import util
+
+DIR = os.path.dirname(__file__)
+DATA_PATH = os.path.join(DIR, "test_library_data/gamedetails.json")
+GOG_LIBRARY = util.load_json(DATA_PATH)
+
+# Setup files of games in GOG_LIBRARY, by game or DLC name
+INSTALLERS = {
+    'tyranny_game': 'tyranny_en_1_2_1_0158_15398.sh',
+    'darkest_dungeon': 'darkest_dungeon_en_21142_16140.sh',
+    'darkest_dungeon_the_crimson_court':
+        'darkest_dungeon_the_crimson_court_dlc_en_21096_16065.sh',
+}
+
+
+def make_installer(path, files, modes=None):
+    """Write a GOG style installer: a shell script with a zip appended."""
+    modes = modes or {}
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, 'w') as archive:
+        archive.writestr('scripts/config.lua', 'config')
+        for name, content in files.items():
+            info = zipfile.ZipInfo('data/noarch/' + name)
+            info.external_attr = modes.get(name, 0o100644) << 16
+            archive.writestr(info, content)
+    util.mkdir(os.path.dirname(path))
+    with open(path, 'wb') as f:
+        f.write(b'#!/bin/sh\nexit 0\n')
+        f.write(zip_buffer.getvalue())
+    return path
+
+
+def make_downloads(download_dir):
+    """Write the installers of two games and a DLC, laid out the way
+    lgogdownloader does by default.
+    """
+    make_installer(
+        os.path.join(download_dir, 'tyranny_game', INSTALLERS['tyranny_game']),
+        {'start.sh': 'tyranny', 'game/data.bin': 'data'}
+    )
+    make_installer(
+        os.path.join(download_dir, 'darkest_dungeon',
+                     INSTALLERS['darkest_dungeon']),
+        {'start.sh': 'darkest dungeon', 'version.txt': 'base'}
+    )
+    make_installer(
+        os.path.join(download_dir, 'darkest_dungeon', 'dlc',
+                     'darkest_dungeon_the_crimson_court',
+                     INSTALLERS['darkest_dungeon_the_crimson_court']),
+        {'dlc/crimson_court.pak': 'dlc', 'version.txt': 'dlc'}
+    )
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+from collections import Counter
+from unittest import mock
+
+from gogtool import util
+from gogtool.game import Game
+from gogtool.library import Library
+
+DIR = os.path.dirname(__file__)
+DATA_PATH = os.path.join(DIR, "test_library_data/gamedetails.json")
+GOG_LIBRARY = util.load_json(DATA_PATH)
+
+GAME_INFO = {
+    "gamename": "deus_ex",
+    "title": "Deus Ex GOTY Edition",
+    "installers": [
+        {
+         "gamename": "deus_ex",
+         "id": "en1installer0",
+         "path": "/9327/setup_deus_ex_goty_1.112fm(revision_1.3.1)_(17719).exe",
+         "platform": 1,
+        }
+    ]
+}
+LATEST = "setup_deus_ex_goty_1.112fm(revision_1.3.1)_(17719).exe"
+OUTDATED = "setup_deus_ex_goty_1.112fm(revision_1.3.0)_(17000).exe"
+
+
+def touch(*path_parts):
+    path = os.path.join(*path_parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'w').close()
+    return path
+
+
+class TestGameDownloadState(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.download_dir = os.path.join(self.temp_dir.name, 'deus_ex')
+        self.scandir = mock.patch.object(util, 'scandir', wraps=util.scandir)
+        self.scandir_mock = self.scandir.start()
+
+    def tearDown(self):
+        self.scandir.stop()
+        self.temp_dir.cleanup()
+
+    def test_not_read_on_init(self):
+        Game(GAME_INFO, download_dir=self.download_dir)
+        self.assertEqual(self.scandir_mock.call_count, 0)
+
+    def test_read_once(self):
+        touch(self.download_dir, LATEST)
+        game = Game(GAME_INFO, download_dir=self.download_dir)
+        self.assertTrue(game.is_downloaded)
+        self.assertFalse(game.needs_update)
+        game.download_dir = self.download_dir
+        self.assertEqual(len(game.downloaded_files), 1)
+        self.assertEqual(self.scandir_mock.call_count, 1)
+
+    def test_invalidate(self):
+        game = Game(GAME_INFO, download_dir=self.download_dir)
+        self.assertFalse(game.is_downloaded)
+        touch(self.download_dir, OUTDATED)
+        self.assertFalse(game.is_downloaded)
+        game.invalidate()
+        self.assertTrue(game.is_downloaded)
+        self.assertTrue(game.needs_update)
+        self.assertEqual(self.scandir_mock.call_count, 2)
+
+    def test_download_dir_changed(self):
+        other_dir = os.path.join(self.temp_dir.name, 'other')
+        touch(other_dir, LATEST)
+        game = Game(GAME_INFO, download_dir=self.download_dir)
+        self.assertFalse(game.is_downloaded)
+        game.download_dir = other_dir
+        self.assertTrue(game.is_downloaded)
+        self.assertEqual(self.scandir_mock.call_count, 2)
+
+    def test_library_scan_reads_each_dir_once(self):
+        touch(self.download_dir, OUTDATED)
+        touch(self.download_dir, 'dlc', 'deus_ex_revision', 'setup_revision.exe')
+        config = {
+            'download_dir': self.temp_dir.name,
+            'install_dir': os.path.join(self.temp_dir.name, 'games'),
+            'scan_workers': 4,
+            'lgogdownloader': {
+                'subdir-game': '%gamename%',
+                'subdir-dlc': 'dlc/%dlcname%',
+            },
+        }
+        library = Library(GOG_LIBRARY, config)
+        for _ in range(2):
+            self.assertEqual([g.name for g in library.downloaded_games], ['deus_ex'])
+            self.assertEqual([g.name for g in library.outdated_games], ['deus_ex'])
+            dlc = library.get_game('deus_ex').installable_dlcs[0]
+            self.assertTrue(dlc.is_downloaded)
+        dirs_read = Counter(c.args[0] for c in self.scandir_mock.call_args_list)
+        self.assertEqual(set(dirs_read.values()), {1})
+        self.assertIn(self.download_dir, dirs_read)
+
+
+if __name__ == '__main__':
+    unittest.main()
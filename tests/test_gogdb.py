@@ -0,0 +1,185 @@
+import csv
+import io
+import os
+import tempfile
+import threading
+import unittest
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from gogtool.gogdb import GOGDB, GOGDBError, INDEX_SUFFIX
+
+PRODUCTS = [
+    {'id': '1207658930', 'slug': 'age_of_wonders', 'image_logo': 'aow_logo'},
+    {'id': '1207664643', 'slug': 'darkest_dungeon', 'image_logo': 'dd_logo'},
+    {'id': '1207664644', 'slug': 'darkest_dungeon', 'image_logo': 'dd_dupe'},
+]
+
+
+def make_test_archive(products=PRODUCTS):
+    csv_buffer = io.StringIO()
+    writer = csv.DictWriter(csv_buffer, fieldnames=['id', 'slug', 'image_logo'])
+    writer.writeheader()
+    writer.writerows(products)
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, 'w') as archive:
+        archive.writestr('products.csv', csv_buffer.getvalue())
+    return zip_buffer.getvalue()
+
+
+class BackupHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the gogdb.org backup directory."""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.path)
+        if self.path == '/filelist.txt':
+            etag = f'"{len(server.archives)}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = "".join(f"backups/{n}\n" for n in server.archives).encode()
+            self.send_response(200)
+            self.send_header('ETag', etag)
+        else:
+            body = server.archives[os.path.basename(self.path)]
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestGOGDB(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.archive = os.path.join(self.temp_dir.name, 'gogdb_test.zip')
+        with open(self.archive, 'wb') as f:
+            f.write(make_test_archive())
+        self.gog_db = GOGDB(self.archive)
+
+    def tearDown(self):
+        if self.gog_db._db is not None:
+            self.gog_db._db.close()
+        self.temp_dir.cleanup()
+
+    def test_index_built(self):
+        self.assertEqual(self.gog_db.index_path, self.archive + INDEX_SUFFIX)
+        self.assertTrue(os.path.exists(self.gog_db.index_path))
+
+    def test_get_game(self):
+        game = self.gog_db.get_game('age_of_wonders')
+        self.assertDictEqual(game, PRODUCTS[0])
+        self.assertIsNone(self.gog_db.get_game('does_not_exist'))
+
+    def test_get_game_img(self):
+        self.assertEqual(self.gog_db.get_game_img('darkest_dungeon'), 'dd_logo')
+        self.assertIsNone(self.gog_db.get_game_img('does_not_exist'))
+
+    def test_index_reused(self):
+        mtime = os.stat(self.gog_db.index_path).st_mtime_ns
+        gog_db = GOGDB(self.archive)
+        self.assertEqual(gog_db.get_game_img('age_of_wonders'), 'aow_logo')
+        self.assertEqual(os.stat(gog_db.index_path).st_mtime_ns, mtime)
+        gog_db.db.close()
+
+
+class TestGOGDBDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = self.temp_dir.name
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), BackupHandler)
+        self.server.requests = []
+        self.server.archives = {'gogdb_2018-01-01.zip': make_test_archive()}
+        self.base_url = 'http://127.0.0.1:{}/'.format(self.server.server_port)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def make_gogdb(self, **kwargs):
+        gog_db = GOGDB(cache_dir=self.cache_dir, base_url=self.base_url, **kwargs)
+        self.addCleanup(lambda: gog_db._db and gog_db._db.close())
+        return gog_db
+
+    def test_download(self):
+        gog_db = self.make_gogdb()
+        self.assertEqual(
+            gog_db.db_archive,
+            os.path.join(self.cache_dir, 'gogdb', 'gogdb_2018-01-01.zip')
+        )
+        self.assertEqual(gog_db.get_game_img('age_of_wonders'), 'aow_logo')
+        self.assertEqual(
+            self.server.requests,
+            ['/filelist.txt', '/backups/gogdb_2018-01-01.zip']
+        )
+        leftovers = [
+            f for f in os.listdir(gog_db.cache_dir) if f.endswith('.part')
+        ]
+        self.assertEqual(leftovers, [])
+
+    def test_not_modified(self):
+        self.make_gogdb()
+        self.make_gogdb()
+        self.assertEqual(
+            self.server.requests,
+            ['/filelist.txt', '/backups/gogdb_2018-01-01.zip', '/filelist.txt']
+        )
+
+    def test_refresh_interval(self):
+        self.make_gogdb(refresh_interval=3600)
+        gog_db = self.make_gogdb(refresh_interval=3600)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(gog_db.get_game_img('darkest_dungeon'), 'dd_logo')
+
+    def test_prune(self):
+        old = self.make_gogdb()
+        self.server.archives['gogdb_2018-02-01.zip'] = make_test_archive(
+            [{'id': '1', 'slug': 'age_of_wonders', 'image_logo': 'new_logo'}]
+        )
+        new = self.make_gogdb()
+        self.assertEqual(new.get_game_img('age_of_wonders'), 'new_logo')
+        self.assertFalse(os.path.exists(old.db_archive))
+        self.assertFalse(os.path.exists(old.index_path))
+        self.assertTrue(os.path.exists(new.index_path))
+
+    def test_offline(self):
+        with self.assertRaises(GOGDBError):
+            self.make_gogdb(offline=True)
+        self.make_gogdb()
+        gog_db = self.make_gogdb(offline=True)
+        self.assertEqual(gog_db.get_game_img('age_of_wonders'), 'aow_logo')
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_unreachable(self):
+        self.make_gogdb()
+        self.server.shutdown()
+        self.server.server_close()
+        gog_db = self.make_gogdb()
+        self.assertEqual(gog_db.get_game_img('age_of_wonders'), 'aow_logo')
+
+    def test_empty_file_list(self):
+        self.make_gogdb()
+        self.server.archives.clear()
+        gog_db = self.make_gogdb()
+        self.assertEqual(gog_db.get_game_img('age_of_wonders'), 'aow_logo')
+        # Nothing cached to fall back to
+        with self.assertRaises(GOGDBError):
+            GOGDB(cache_dir=os.path.join(self.cache_dir, 'empty'),
+                  base_url=self.base_url)
+
+    def test_corrupt_archive(self):
+        self.server.archives['gogdb_2018-01-01.zip'] = b'not a zip'
+        with self.assertRaises(GOGDBError):
+            self.make_gogdb()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import hashlib
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from gogtool import hashcache
+
+
+class TestHashCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'cache', 'hashes.sqlite')
+        self.cache = hashcache.HashCache(self.db_path)
+
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def write(self, name, content, age=60):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        # Older than the racy interval, so the hash is stored
+        mtime = os.stat(path).st_mtime - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_hash_file(self):
+        for size in (0, 1, 4096, 10000):
+            content = os.urandom(size)
+            path = self.write('setup.bin', content)
+            self.assertEqual(hashcache.hash_file(path, block_size=4096),
+                             hashlib.md5(content).hexdigest())
+        self.assertEqual(hashcache.hash_file(path, 'sha256'),
+                         hashlib.sha256(content).hexdigest())
+
+    def test_hashed_once(self):
+        path = self.write('setup.sh', b'installer')
+        self.assertIsNone(self.cache.get(path))
+        self.assertEqual(self.cache.hash(path), hashlib.md5(b'installer').hexdigest())
+
+        cache = hashcache.HashCache(self.db_path)
+        with mock.patch('gogtool.hashcache.hash_file') as hash_file:
+            self.assertEqual(cache.hash(path), hashlib.md5(b'installer').hexdigest())
+            # Renaming keeps the inode
+            renamed = os.path.join(self.temp_dir.name, 'renamed.sh')
+            os.rename(path, renamed)
+            self.assertEqual(cache.get(renamed), hashlib.md5(b'installer').hexdigest())
+        hash_file.assert_not_called()
+        cache.close()
+
+    def test_changed_file(self):
+        path = self.write('setup.sh', b'installer')
+        self.cache.hash(path)
+        self.write('setup.sh', b'installer 2', age=30)
+        self.assertIsNone(self.cache.get(path))
+        self.assertEqual(self.cache.hash(path), hashlib.md5(b'installer 2').hexdigest())
+
+    def test_recently_modified_not_stored(self):
+        path = self.write('setup.sh', b'installer', age=0)
+        self.cache.hash(path)
+        self.assertIsNone(self.cache.get(path))
+
+    def test_concurrent_requests(self):
+        path = self.write('setup.sh', b'installer')
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_hash(*args):
+            started.set()
+            release.wait(5)
+            return 'digest'
+
+        with mock.patch('gogtool.hashcache.hash_file', side_effect=slow_hash) as hash_file:
+            executor = self.cache.prefill([path])
+            started.wait(5)
+            waiter = threading.Thread(target=self.cache.hash, args=(path,))
+            waiter.start()
+            release.set()
+            waiter.join(5)
+            executor.shutdown()
+        hash_file.assert_called_once()
+        self.assertEqual(self.cache.get(path), 'digest')
+
+    def test_prefill_missing_file(self):
+        executor = self.cache.prefill([os.path.join(self.temp_dir.name, 'missing')])
+        executor.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,303 @@
+import io
+import os
+import stat
+import tempfile
+import unittest
+import zipfile
+import zlib
+from unittest import mock
+
+from gogtool import installer, manifest, util
+from tests.helpers import make_installer
+
+
+class TestExtractLinuxInstaller(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.installer = os.path.join(self.temp_dir.name, 'game.sh')
+        self.dest = os.path.join(self.temp_dir.name, 'game')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read(self, *path_parts):
+        with open(os.path.join(self.dest, *path_parts)) as f:
+            return f.read()
+
+    def test_extract(self):
+        make_installer(self.installer, {
+            'start.sh': 'start',
+            'game/bin/game': 'binary',
+            'game/bin/libgame.so': 'library',
+            'docs/README': 'readme',
+        }, modes={'start.sh': 0o100755, 'game/bin/game': 0o100755})
+        installer.extract_linux_installer(self.installer, self.dest)
+
+        self.assertEqual(self.read('start.sh'), 'start')
+        self.assertEqual(self.read('game', 'bin', 'libgame.so'), 'library')
+        self.assertFalse(os.path.exists(os.path.join(self.dest, 'scripts')))
+        self.assertEqual(
+            stat.S_IMODE(os.stat(os.path.join(self.dest, 'start.sh')).st_mode),
+            0o755
+        )
+        self.assertEqual(
+            stat.S_IMODE(os.stat(os.path.join(self.dest, 'docs', 'README')).st_mode),
+            0o644
+        )
+        entries = manifest.read_manifest(self.dest)
+        self.assertEqual(list(entries), [
+            'start.sh', 'game/bin/game', 'game/bin/libgame.so', 'docs/README',
+        ])
+        self.assertEqual(
+            entries['start.sh'],
+            manifest.Entry('start.sh', 5, zlib.crc32(b'start'), 0o100755,
+                           'game.sh', None,
+                           os.lstat(os.path.join(self.dest, 'start.sh')).st_mtime_ns)
+        )
+
+    def test_extract_symlink(self):
+        make_installer(self.installer, {
+            'lib/libgame.so.1': 'library',
+            'lib/libgame.so': 'libgame.so.1',
+        }, modes={'lib/libgame.so': 0o120777})
+        installer.extract_linux_installer(self.installer, self.dest)
+        link = os.path.join(self.dest, 'lib', 'libgame.so')
+        self.assertTrue(os.path.islink(link))
+        self.assertEqual(os.readlink(link), 'libgame.so.1')
+        self.assertEqual(self.read('lib', 'libgame.so'), 'library')
+
+    def test_extract_over_existing_files(self):
+        make_installer(self.installer, {'start.sh': 'base'})
+        installer.extract_linux_installer(self.installer, self.dest)
+        os.chmod(os.path.join(self.dest, 'start.sh'), 0o444)
+        make_installer(self.installer, {'start.sh': 'dlc', 'dlc.pak': 'dlc'})
+        installer.extract_linux_installer(self.installer, self.dest)
+
+        self.assertEqual(self.read('start.sh'), 'dlc')
+        self.assertEqual(sorted(manifest.read_manifest(self.dest)),
+                         ['dlc.pak', 'start.sh'])
+
+    def test_extract_parallel(self):
+        files = {f'game/data_{i}.bin': str(i) * i for i in range(50)}
+        files['start.sh'] = 'start'
+        make_installer(self.installer, files, modes={'start.sh': 0o100755})
+        members = installer.extract_linux_installer(
+            self.installer, self.dest, workers=4
+        )
+
+        for name, content in files.items():
+            self.assertEqual(self.read(name), content)
+        self.assertTrue(os.access(os.path.join(self.dest, 'start.sh'), os.X_OK))
+        self.assertEqual(len(members), len(files))
+        self.assertEqual(
+            sorted(manifest.read_manifest(self.dest)), sorted(files)
+        )
+
+    def test_update(self):
+        make_installer(self.installer, {
+            'start.sh': 'start', 'game/data.bin': 'v1', 'game/old.bin': 'old',
+        })
+        installer.extract_linux_installer(self.installer, self.dest,
+                                          origin='game')
+        make_installer(self.installer, {
+            'start.sh': 'start', 'game/data.bin': 'v2', 'new/new.bin': 'new',
+        })
+        written = installer.extract_linux_installer(self.installer, self.dest,
+                                                    origin='game')
+
+        self.assertEqual([info.filename for info in written], [
+            'data/noarch/game/data.bin', 'data/noarch/new/new.bin',
+        ])
+        self.assertEqual(self.read('game', 'data.bin'), 'v2')
+        self.assertFalse(os.path.exists(os.path.join(self.dest, 'game', 'old.bin')))
+        self.assertEqual(sorted(manifest.read_manifest(self.dest)), [
+            'game/data.bin', 'new/new.bin', 'start.sh',
+        ])
+
+    def test_update_file_to_dir(self):
+        make_installer(self.installer, {'start.sh': 'start', 'a/b': 'file'})
+        installer.extract_linux_installer(self.installer, self.dest,
+                                          origin='game')
+        make_installer(self.installer, {'start.sh': 'start 2', 'a/b/c': 'dir'})
+        installer.extract_linux_installer(self.installer, self.dest,
+                                          origin='game')
+        self.assertEqual(self.read('a', 'b', 'c'), 'dir')
+        self.assertEqual(sorted(manifest.read_manifest(self.dest)), [
+            'a/b/c', 'start.sh',
+        ])
+        self.assertEqual(self.verify(), {})
+
+    def test_update_failed(self):
+        make_installer(self.installer, {'start.sh': 'start', 'data.bin': 'v1'})
+        installer.extract_linux_installer(self.installer, self.dest)
+        make_installer(self.installer, {'start.sh': 'start 2', 'data.bin': 'v2'})
+        extract_member = installer.extract_member
+
+        def fail_on_data(archive, info, path):
+            if info.filename.endswith('data.bin'):
+                raise OSError("No space left on device")
+            extract_member(archive, info, path)
+
+        with mock.patch('gogtool.installer.extract_member', fail_on_data):
+            with self.assertRaises(OSError):
+                installer.extract_linux_installer(self.installer, self.dest)
+        # The manifest has what was written, the rest shows up as damaged
+        damaged = self.verify()
+        self.assertEqual(self.read('start.sh'), 'start 2')
+        self.assertEqual(
+            [(d.entry.path, d.reason) for d in damaged.values()],
+            [('data.bin', 'CRC differs')]
+        )
+        installer.extract_linux_installer(self.installer, self.dest)
+        self.assertEqual(self.read('data.bin'), 'v2')
+        self.assertEqual(self.verify(), {})
+
+    def test_update_damaged_file(self):
+        make_installer(self.installer, {'start.sh': 'start', 'data.bin': 'data'})
+        installer.extract_linux_installer(self.installer, self.dest)
+        os.unlink(os.path.join(self.dest, 'start.sh'))
+        with open(os.path.join(self.dest, 'data.bin'), 'w') as f:
+            f.write('truncated')
+        written = installer.extract_linux_installer(self.installer, self.dest)
+        self.assertEqual(len(written), 2)
+        self.assertEqual(self.read('data.bin'), 'data')
+
+    def test_update_keeps_dlc_files(self):
+        dlc_installer = os.path.join(self.temp_dir.name, 'dlc.sh')
+        make_installer(self.installer, {'start.sh': 'start', 'version': 'base'})
+        make_installer(dlc_installer, {'dlc.pak': 'dlc', 'version': 'dlc'})
+        installer.extract_linux_installer(self.installer, self.dest,
+                                          origin='game')
+        installer.extract_linux_installer(dlc_installer, self.dest,
+                                          origin='game_dlc')
+
+        make_installer(self.installer, {'start.sh': 'start 2', 'version': 'base'})
+        installer.extract_linux_installer(self.installer, self.dest,
+                                          origin='game')
+        self.assertEqual(self.read('dlc.pak'), 'dlc')
+        entries = manifest.read_manifest(self.dest)
+        self.assertEqual(entries['dlc.pak'].origin, 'game_dlc')
+        self.assertEqual(entries['start.sh'].origin, 'game')
+
+    def verify(self, **kwargs):
+        entries = manifest.read_manifest(self.dest)
+        return installer.verify_install(self.dest, entries, **kwargs)
+
+    def test_verify_install(self):
+        make_installer(self.installer, {
+            'start.sh': 'start', 'missing': 'missing', 'truncated': 'truncated',
+            'changed': 'changed', 'lib/libgame.so.1': 'library',
+            'lib/libgame.so': 'libgame.so.1',
+        }, modes={'lib/libgame.so': 0o120777})
+        installer.extract_linux_installer(self.installer, self.dest)
+        self.assertEqual(self.verify(), {})
+
+        os.unlink(os.path.join(self.dest, 'missing'))
+        for name, content in (('truncated', 'trunc'), ('changed', 'CHANGED')):
+            with open(os.path.join(self.dest, name), 'w') as f:
+                f.write(content)
+        os.unlink(os.path.join(self.dest, 'lib', 'libgame.so'))
+        os.symlink('libother.so', os.path.join(self.dest, 'lib', 'libgame.so'))
+
+        damaged = self.verify(workers=2)
+        self.assertEqual(
+            {os.path.relpath(p, self.dest): d.reason for p, d in damaged.items()},
+            {
+                'missing': 'missing',
+                'truncated': 'size differs',
+                'changed': 'CRC differs',
+                'lib/libgame.so': 'wrong link target',
+            }
+        )
+
+        installers = {'game.sh': self.installer}
+        repaired, unavailable = installer.repair_install(
+            self.dest, damaged, installers, workers=2
+        )
+        self.assertEqual(len(repaired), 4)
+        self.assertEqual(unavailable, [])
+        self.assertEqual(self.verify(full=True), {})
+        self.assertEqual(self.read('changed'), 'changed')
+        # The manifest has the mtimes of the repaired files
+        st = os.stat(os.path.join(self.dest, 'changed'))
+        entry = manifest.read_manifest(self.dest)['changed']
+        self.assertEqual(entry.mtime_ns, st.st_mtime_ns)
+
+    def test_verify_install_unchanged_mtime(self):
+        make_installer(self.installer, {'data.pak': 'data'})
+        installer.extract_linux_installer(self.installer, self.dest)
+        path = os.path.join(self.dest, 'data.pak')
+        st = os.stat(path)
+        with open(path, 'w') as f:
+            f.write('DATA')
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+        # Files with the recorded size and mtime are only read when asked
+        self.assertEqual(self.verify(), {})
+        damaged = self.verify(full=True)
+        self.assertEqual([d.reason for d in damaged.values()], ['CRC differs'])
+
+    def test_verify_install_with_dlc(self):
+        dlc_installer = os.path.join(self.temp_dir.name, 'dlc.sh')
+        make_installer(self.installer, {'start.sh': 'start', 'version': 'base'})
+        make_installer(dlc_installer, {'dlc.pak': 'dlc', 'version': 'dlc'})
+        installer.extract_linux_installer(self.installer, self.dest,
+                                          origin='game')
+        installer.extract_linux_installer(dlc_installer, self.dest,
+                                          origin='game_dlc')
+
+        self.assertEqual(self.verify(), {})
+        os.unlink(os.path.join(self.dest, 'version'))
+        os.unlink(os.path.join(self.dest, 'start.sh'))
+        damaged = self.verify()
+        self.assertEqual(
+            {d.entry.path: d.entry.origin for d in damaged.values()},
+            {'version': 'game_dlc', 'start.sh': 'game'}
+        )
+
+        # Only the DLC's setup file is at hand
+        repaired, unavailable = installer.repair_install(
+            self.dest, damaged, {'dlc.sh': dlc_installer}
+        )
+        self.assertEqual([e.path for e in repaired], ['version'])
+        self.assertEqual([e.path for e in unavailable], ['start.sh'])
+        self.assertEqual(self.read('version'), 'dlc')
+
+    def test_split_members(self):
+        members = []
+        for size in (100, 50, 40, 10):
+            info = zipfile.ZipInfo(f'data/noarch/{size}')
+            info.file_size = size
+            members.append(info)
+        chunks = installer.split_members(members, 2)
+        self.assertEqual(
+            [sum(info.file_size for info in chunk) for chunk in chunks],
+            [100, 100]
+        )
+        self.assertEqual(len(installer.split_members(members[:1], 4)), 1)
+
+    def test_member_outside_dest(self):
+        make_installer(self.installer, {'../../evil': 'evil'})
+        with self.assertRaises(ValueError):
+            installer.extract_linux_installer(self.installer, self.dest)
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir.name, 'evil')))
+
+    def test_member_through_symlink(self):
+        outside = os.path.join(self.temp_dir.name, 'outside')
+        os.mkdir(outside)
+        make_installer(self.installer, {'link': outside, 'link/evil': 'evil'},
+                       modes={'link': 0o120777})
+        with self.assertRaises(ValueError):
+            installer.extract_linux_installer(self.installer, self.dest)
+        self.assertEqual(os.listdir(outside), [])
+
+    def test_not_an_installer(self):
+        with open(self.installer, 'w') as f:
+            f.write('#!/bin/sh\nexit 1\n')
+        with self.assertRaises(zipfile.BadZipFile):
+            installer.extract_linux_installer(self.installer, self.dest)
+
+
+if __name__ == '__main__':
+    unittest.main()
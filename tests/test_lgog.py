@@ -0,0 +1,101 @@
+import contextlib
+import io
+import os
+import re
+import stat
+import tempfile
+import unittest
+
+from gogtool import lgog, util
+
+FAKE_LGOGDOWNLOADER = r"""#!/bin/sh
+while [ $# -gt 0 ]; do
+    case "$1" in
+        --directory) dir="$2"; shift ;;
+        --platform) platform="$2"; shift ;;
+        --game) pattern="$2"; shift ;;
+    esac
+    shift
+done
+echo "$platform $pattern" >> "$dir/invocations"
+rc=0
+for game in $(echo "$pattern" | sed -e 's/^^(//' -e 's/)\$$//' | tr '|' ' '); do
+    if [ "$game" = "broken" ]; then
+        echo "Failed to download $dir/$game/setup_$game.sh"
+        rc=1
+        continue
+    fi
+    printf "$dir/$game/setup_$game.sh 10%%\r$dir/$game/setup_$game.sh 100%%\n"
+done
+exit $rc
+"""
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_game_pattern(self):
+        pattern = lgog.game_pattern(['deus_ex', 'deus_ex_revision', 'a.b'])
+        self.assertRegex('deus_ex', pattern)
+        self.assertRegex('deus_ex_revision', pattern)
+        self.assertRegex('a.b', pattern)
+        self.assertIsNone(re.search(pattern, 'deus_ex_2'))
+        self.assertIsNone(re.search(pattern, 'axb'))
+
+    def test_parse_download_output(self):
+        output = [
+            "Getting game info 1 / 2",
+            "/games/deus_ex/setup_deus_ex.exe 50%",
+            "/games/deus_ex_revision/setup_revision.exe 100%",
+            "Failed - /games/deus_ex_revision/patch.exe",
+        ]
+        results = lgog.parse_download_output(
+            output, ['deus_ex', 'deus_ex_revision', 'tyranny_game']
+        )
+        self.assertTrue(results['deus_ex'].ok)
+        self.assertEqual(len(results['deus_ex'].lines), 1)
+        self.assertFalse(results['deus_ex_revision'].ok)
+        self.assertTrue(results['tyranny_game'].ok)
+
+        lgog.check_returncode(results, 1)
+        self.assertFalse(results['tyranny_game'].ok)
+        self.assertTrue(results['deus_ex'].ok)
+
+
+class TestDownloadBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        bin_dir = os.path.join(self.temp_dir.name, 'bin')
+        util.mkdir(bin_dir)
+        script = os.path.join(bin_dir, 'lgogdownloader')
+        with open(script, 'w') as f:
+            f.write(FAKE_LGOGDOWNLOADER)
+        os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+        self.path = os.environ['PATH']
+        os.environ['PATH'] = bin_dir + os.pathsep + self.path
+        self.dest = self.temp_dir.name
+
+    def tearDown(self):
+        os.environ['PATH'] = self.path
+        self.temp_dir.cleanup()
+
+    def test_download_batch(self):
+        games = [('a', 'l'), ('broken', 'l'), ('c', 'w'), ('d', 'l')]
+        output = io.TextIOWrapper(io.BytesIO())
+        with contextlib.redirect_stdout(output):
+            results = lgog.download_batch(games, self.dest)
+        self.assertEqual(sorted(results), ['a', 'broken', 'c', 'd'])
+        self.assertEqual(
+            [name for name, result in sorted(results.items()) if not result.ok],
+            ['broken']
+        )
+        self.assertEqual(len(results['a'].lines), 2)
+        with open(os.path.join(self.dest, 'invocations')) as f:
+            invocations = f.read().splitlines()
+        self.assertEqual(invocations, ['l ^(broken|a|d)$', 'w ^(c)$'])
+        output.flush()
+        self.assertIn(b"setup_c.sh 100%", output.buffer.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
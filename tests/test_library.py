@@ -0,0 +1,160 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from gogtool import manifest, util
+from gogtool.library import Library
+from tests.helpers import INSTALLERS, make_downloads
+
+DIR = os.path.dirname(__file__)
+DATA_PATH = os.path.join(DIR, "test_library_data/gamedetails.json")
+GOG_LIBRARY = util.load_json(DATA_PATH)
+
+
+def make_config(download_dir, install_dir):
+    return {
+        'download_dir': download_dir,
+        'install_dir': install_dir,
+        'gogdb_offline': True,
+        'lgogdownloader': {
+            'subdir-game': '%gamename%',
+            'subdir-dlc': 'dlc/%dlcname%',
+        },
+    }
+
+
+class TestLibrary(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.download_dir = os.path.join(self.temp_dir.name, 'downloads')
+        self.install_dir = os.path.join(self.temp_dir.name, 'games')
+        os.makedirs(os.path.join(self.download_dir, 'deus_ex'))
+        os.makedirs(os.path.join(self.download_dir, 'not_a_game'))
+        os.makedirs(os.path.join(self.install_dir, 'Age of Wonders'))
+        os.makedirs(os.path.join(self.install_dir, 'darkest_dungeon'))
+        open(os.path.join(self.install_dir, 'tyranny_game'), 'w').close()
+        self.config = make_config(self.download_dir, self.install_dir)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_gogdb_not_loaded(self):
+        library = Library(GOG_LIBRARY, self.config)
+        self.assertIsNone(library._gog_db)
+
+    def test_get_game(self):
+        library = Library(GOG_LIBRARY, self.config)
+        game = library.get_game('deus_ex')
+        self.assertEqual(game.title, 'Deus Ex™ GOTY Edition')
+        self.assertIs(library.get_game('deus_ex'), game)
+
+    def test_scan_download_dir(self):
+        library = Library(GOG_LIBRARY, self.config)
+        self.assertEqual(
+            [g.download_dir for g in library.local_games if g.download_dir],
+            [os.path.join(self.download_dir, 'deus_ex')]
+        )
+
+    def test_scan_install_dir(self):
+        library = Library(GOG_LIBRARY, self.config)
+        installed = {g.name: g.install_dir for g in library.installed_games}
+        self.assertDictEqual(installed, {
+            'age_of_wonders': os.path.join(self.install_dir, 'Age of Wonders'),
+            'darkest_dungeon': os.path.join(self.install_dir, 'darkest_dungeon'),
+        })
+
+
+class TestInstalledGames(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.download_dir = os.path.join(self.temp_dir.name, 'downloads')
+        self.install_dir = os.path.join(self.temp_dir.name, 'games')
+        util.mkdir(self.install_dir)
+        make_downloads(self.download_dir)
+        self.config = make_config(self.download_dir, self.install_dir)
+        self.library = Library(GOG_LIBRARY, self.config)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read(self, *path_parts):
+        with open(os.path.join(self.install_dir, *path_parts)) as f:
+            return f.read()
+
+    def test_uninstall(self):
+        self.library.install('darkest_dungeon')
+        game_dir = os.path.join(self.install_dir, 'darkest_dungeon')
+        util.mkdir(os.path.join(game_dir, 'saves'))
+        with open(os.path.join(game_dir, 'saves', 'slot_1'), 'w') as f:
+            f.write('save')
+
+        with mock.patch('gogtool.util.user_confirm', return_value=False):
+            self.library.uninstall('darkest_dungeon')
+        # Only the files written by the game and DLC installers are removed
+        self.assertEqual(os.listdir(game_dir), ['saves'])
+
+    def test_uninstall_dry_run(self):
+        self.library.install('darkest_dungeon')
+        with mock.patch('builtins.print') as print_mock:
+            self.library.uninstall('darkest_dungeon', dry_run=True)
+        # start.sh and version.txt from the game, the pak from the DLC
+        self.assertIn('would delete 3 files (21 B)',
+                      print_mock.call_args[0][0])
+        self.assertEqual(self.read('darkest_dungeon', 'version.txt'), 'dlc')
+
+    def test_uninstall_from_file_list(self):
+        self.library.install('tyranny_game')
+        game_dir = os.path.join(self.install_dir, 'tyranny_game')
+        util.rm(os.path.join(game_dir, manifest.MANIFEST_FILE))
+        with open(os.path.join(game_dir, 'files.txt'), 'w') as f:
+            f.write('data/noarch/game/\ndata/noarch/game/data.bin\n'
+                    'data/noarch/start.sh\n')
+        with open(os.path.join(game_dir, 'game', 'settings.ini'), 'w') as f:
+            f.write('settings')
+
+        with mock.patch('gogtool.util.user_confirm', return_value=False):
+            self.library.uninstall('tyranny_game')
+        self.assertEqual(os.listdir(game_dir), ['game'])
+        self.assertEqual(os.listdir(os.path.join(game_dir, 'game')),
+                         ['settings.ini'])
+
+    def test_verify(self):
+        path = os.path.join(self.download_dir, 'darkest_dungeon',
+                            INSTALLERS['darkest_dungeon'])
+        with open(path, 'r+b') as f:
+            f.truncate(100)
+        xml_dir = os.path.join(self.temp_dir.name, 'xml')
+        self.config['lgog_xml_dir'] = xml_dir
+        self.config['cache_dir'] = os.path.join(self.temp_dir.name, 'cache')
+        # lgogdownloader's data is kept per game or DLC name
+        dlc_name = 'darkest_dungeon_the_crimson_court'
+        util.mkdir(os.path.join(xml_dir, dlc_name))
+        with open(os.path.join(xml_dir, dlc_name,
+                               INSTALLERS[dlc_name] + '.xml'), 'w') as f:
+            f.write('<file md5="0123456789abcdef0123456789abcdef"/>')
+        results = {
+            os.path.basename(r.path): (r.status, r.detail.split()[0])
+            for r in self.library.verify()
+        }
+        self.assertEqual(results, {
+            INSTALLERS['darkest_dungeon']: ('corrupt', 'not'),
+            INSTALLERS[dlc_name]: ('corrupt', 'md5'),
+            INSTALLERS['tyranny_game']: ('ok', 'zip'),
+        })
+
+    def test_verify_install(self):
+        self.library.install('darkest_dungeon')
+        util.rm(os.path.join(self.install_dir, 'darkest_dungeon', 'start.sh'))
+        with mock.patch('builtins.print'):
+            damaged = self.library.verify_install('darkest_dungeon', repair=True)
+        self.assertEqual(len(damaged), 1)
+        self.assertEqual(self.read('darkest_dungeon', 'start.sh'), 'darkest dungeon')
+        with mock.patch('builtins.print'):
+            self.assertEqual(self.library.verify_install('darkest_dungeon'), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from gogtool import orphans, util
+from gogtool.library import Library
+from tests.helpers import GOG_LIBRARY, INSTALLERS
+
+
+class TestOrphans(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.download_dir = os.path.join(self.temp_dir.name, 'downloads')
+        dlc_dir = os.path.join('darkest_dungeon', 'dlc',
+                               'darkest_dungeon_the_crimson_court')
+        files = {
+            os.path.join('tyranny_game', INSTALLERS['tyranny_game']): 1,
+            os.path.join('tyranny_game', 'tyranny_en_1_0_0_1.sh'): 100,
+            os.path.join('tyranny_game', 'notes.txt'): 10,
+            os.path.join('tyranny_game', 'extras', 'manual.zip'): 10,
+            os.path.join('darkest_dungeon', INSTALLERS['darkest_dungeon']): 1,
+            os.path.join(dlc_dir,
+                         INSTALLERS['darkest_dungeon_the_crimson_court']): 1,
+            os.path.join(dlc_dir, 'darkest_dungeon_the_crimson_court_old.sh'): 20,
+            os.path.join('removed_game', 'setup_removed_game.exe'): 30,
+        }
+        for path, size in files.items():
+            path = os.path.join(self.download_dir, path)
+            util.mkdir(os.path.dirname(path))
+            with open(path, 'wb') as f:
+                f.write(b'x' * size)
+        self.config = {
+            'download_dir': self.download_dir,
+            'install_dir': os.path.join(self.temp_dir.name, 'games'),
+            'lgogdownloader': {
+                'subdir-game': '%gamename%',
+                'subdir-dlc': 'dlc/%dlcname%',
+            },
+        }
+        self.library = Library(GOG_LIBRARY, self.config)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def relpaths(self, found):
+        return sorted(os.path.relpath(o.path, self.download_dir) for o in found)
+
+    def test_scan_orphans(self):
+        unknown_dirs = []
+        found = list(orphans.scan_orphans(self.library, unknown_dirs))
+        self.assertEqual(self.relpaths(found), [
+            'darkest_dungeon/dlc/darkest_dungeon_the_crimson_court/'
+            'darkest_dungeon_the_crimson_court_old.sh',
+            'tyranny_game/tyranny_en_1_0_0_1.sh',
+        ])
+        self.assertEqual(orphans.summarize(found), {
+            'darkest_dungeon': (1, 20),
+            'tyranny_game': (1, 100),
+        })
+        # Directories of games not in the library are only reported
+        self.assertEqual(unknown_dirs,
+                         [os.path.join(self.download_dir, 'removed_game')])
+
+    def test_subdir_formats(self):
+        self.config['lgogdownloader']['subdir-dlc'] = 'extras/%dlcname%'
+        library = Library(GOG_LIBRARY, self.config)
+        self.assertEqual(self.relpaths(library.check_orphaned()), [
+            'tyranny_game/tyranny_en_1_0_0_1.sh',
+        ])
+
+        self.config['lgogdownloader']['subdir-game'] = \
+            '%gamename_firstletter%/%gamename%'
+        library = Library(GOG_LIBRARY, self.config)
+        self.assertEqual(library.check_orphaned(), [])
+
+    def test_delete_orphaned_files(self):
+        with mock.patch('gogtool.util.user_confirm', return_value=True), \
+                mock.patch('builtins.print') as print_mock:
+            self.library.delete_orphaned_files()
+        self.assertIn(mock.call('2 orphaned files, 120 B can be freed'),
+                      print_mock.call_args_list)
+        self.assertEqual(self.library.check_orphaned(), [])
+        self.assertTrue(os.path.exists(os.path.join(
+            self.download_dir, 'removed_game', 'setup_removed_game.exe'
+        )))
+        game = self.library.get_game('tyranny_game')
+        self.assertEqual(
+            [os.path.basename(p) for p in game.downloaded_files],
+            [INSTALLERS['tyranny_game']]
+        )
+
+    def test_nothing_to_delete(self):
+        with mock.patch('gogtool.util.user_confirm') as confirm, \
+                mock.patch('builtins.print'):
+            self.library.delete_orphaned_files()
+            self.library.delete_orphaned_files()
+        self.assertEqual(confirm.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from gogtool import installer, util
+from gogtool.library import Library
+from tests.helpers import (
+    GOG_LIBRARY, INSTALLERS, make_downloads, make_installer
+)
+
+
+class TestInstallPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.download_dir = os.path.join(self.temp_dir.name, 'downloads')
+        self.install_dir = os.path.join(self.temp_dir.name, 'games')
+        util.mkdir(self.install_dir)
+        make_downloads(self.download_dir)
+        self.config = {
+            'download_dir': self.download_dir,
+            'install_dir': self.install_dir,
+            'install_workers': 2,
+            'lgogdownloader': {
+                'subdir-game': '%gamename%',
+                'subdir-dlc': 'dlc/%dlcname%',
+            },
+        }
+        self.library = Library(GOG_LIBRARY, self.config)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read(self, *path_parts):
+        with open(os.path.join(self.install_dir, *path_parts)) as f:
+            return f.read()
+
+    def check_installed(self, timings):
+        self.assertEqual(sorted(timings), ['darkest_dungeon', 'tyranny_game'])
+        self.assertTrue(all(t is not None for t in timings.values()))
+        self.assertEqual(self.read('tyranny_game', 'game', 'data.bin'), 'data')
+        self.assertEqual(self.read('darkest_dungeon', 'start.sh'), 'darkest dungeon')
+        # The DLC is extracted after the base game
+        self.assertEqual(self.read('darkest_dungeon', 'version.txt'), 'dlc')
+        self.assertEqual(
+            [g.name for g in self.library.installed_games],
+            ['darkest_dungeon', 'tyranny_game']
+        )
+        self.assertTrue(self.library.get_game('darkest_dungeon').dlc_installed)
+
+    def test_install_many(self):
+        timings = self.library.install_many(['tyranny_game', 'darkest_dungeon'])
+        self.check_installed(timings)
+
+    def test_install_many_pipelined(self):
+        timings = self.library.install_many(
+            ['tyranny_game', 'darkest_dungeon'], pipelined=True
+        )
+        self.check_installed(timings)
+
+    def test_update(self):
+        self.library.install('tyranny_game')
+        make_installer(
+            os.path.join(self.download_dir, 'tyranny_game',
+                         INSTALLERS['tyranny_game']),
+            {'start.sh': 'tyranny', 'game/data.bin': 'patched'}
+        )
+        self.library.update('tyranny_game')
+        self.assertEqual(self.read('tyranny_game', 'game', 'data.bin'), 'patched')
+
+    def test_update_title_dir(self):
+        self.library.install('tyranny_game')
+        os.rename(os.path.join(self.install_dir, 'tyranny_game'),
+                  os.path.join(self.install_dir, 'Tyranny'))
+        library = Library(GOG_LIBRARY, self.config)
+        make_installer(
+            os.path.join(self.download_dir, 'tyranny_game',
+                         INSTALLERS['tyranny_game']),
+            {'start.sh': 'tyranny', 'game/data.bin': 'patched'}
+        )
+        with mock.patch('gogtool.installer.extract_member',
+                        wraps=installer.extract_member) as extract_member:
+            library.update('tyranny_game')
+        self.assertEqual(extract_member.call_count, 1)
+        self.assertEqual(os.listdir(self.install_dir), ['Tyranny'])
+        self.assertEqual(self.read('Tyranny', 'game', 'data.bin'), 'patched')
+        self.assertEqual(library.get_game('tyranny_game').install_dir,
+                         os.path.join(self.install_dir, 'Tyranny'))
+
+    def test_install_failed(self):
+        util.rm(os.path.join(self.download_dir, 'tyranny_game',
+                             INSTALLERS['tyranny_game']))
+        with open(os.path.join(self.download_dir, 'tyranny_game',
+                               INSTALLERS['tyranny_game']), 'w') as f:
+            f.write('not an installer')
+        timings = self.library.install_many(['tyranny_game', 'darkest_dungeon'])
+        self.assertIsNone(timings['tyranny_game'])
+        self.assertIsNotNone(timings['darkest_dungeon'])
+        self.assertEqual(
+            [g.name for g in self.library.installed_games], ['darkest_dungeon']
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
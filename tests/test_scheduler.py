@@ -0,0 +1,132 @@
+import os
+import stat
+import tempfile
+import time
+import unittest
+
+from gogtool import lgog, util
+from gogtool.library import Library
+from gogtool.scheduler import DownloadScheduler
+
+DIR = os.path.dirname(__file__)
+DATA_PATH = os.path.join(DIR, "test_library_data/gamedetails.json")
+GOG_LIBRARY = util.load_json(DATA_PATH)
+
+FAKE_LGOGDOWNLOADER = """#!/bin/sh
+while [ $# -gt 0 ]; do
+    case "$1" in
+        --directory) dir="$2"; shift ;;
+        --game) game="$2"; shift ;;
+    esac
+    shift
+done
+echo "downloading $game"
+sleep 0.3
+if [ "$game" = "flaky" ] && [ ! -e "$dir/.flaky" ]; then
+    touch "$dir/.flaky"
+    exit 1
+fi
+if [ "$game" = "broken" ]; then
+    exit 2
+fi
+mkdir -p "$dir/$game"
+touch "$dir/$game/setup_$game.sh"
+"""
+
+
+class TestDownloadScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        bin_dir = os.path.join(self.temp_dir.name, 'bin')
+        util.mkdir(bin_dir)
+        script = os.path.join(bin_dir, 'lgogdownloader')
+        with open(script, 'w') as f:
+            f.write(FAKE_LGOGDOWNLOADER)
+        os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+        self.path = os.environ['PATH']
+        os.environ['PATH'] = bin_dir + os.pathsep + self.path
+        self.download_dir = os.path.join(self.temp_dir.name, 'downloads')
+        util.mkdir(self.download_dir)
+        self.progress = []
+
+    def tearDown(self):
+        os.environ['PATH'] = self.path
+        self.temp_dir.cleanup()
+
+    def make_scheduler(self, **kwargs):
+        return DownloadScheduler(
+            retry_delay=0,
+            log_dir=self.temp_dir.name,
+            progress=lambda s, job, status: self.progress.append((job.name, status)),
+            **kwargs
+        )
+
+    def add_games(self, scheduler, *game_names):
+        for game_name in game_names:
+            scheduler.add(
+                game_name, lgog.download_command(game_name, self.download_dir)
+            )
+
+    def test_concurrent(self):
+        scheduler = self.make_scheduler(jobs=3)
+        self.add_games(scheduler, 'a', 'b', 'c')
+        start = time.perf_counter()
+        jobs = scheduler.run()
+        elapsed = time.perf_counter() - start
+        self.assertLess(elapsed, 0.75)
+        self.assertTrue(all(job.succeeded for job in jobs))
+        for game_name in 'abc':
+            setup_file = os.path.join(
+                self.download_dir, game_name, f'setup_{game_name}.sh'
+            )
+            self.assertTrue(os.path.exists(setup_file))
+
+    def test_retry(self):
+        scheduler = self.make_scheduler(jobs=2, retries=1)
+        self.add_games(scheduler, 'flaky', 'broken', 'a')
+        flaky, broken, a = scheduler.run()
+        self.assertTrue(flaky.succeeded)
+        self.assertEqual(flaky.attempts, 2)
+        self.assertFalse(broken.succeeded)
+        self.assertEqual(broken.attempts, 2)
+        self.assertEqual(broken.returncode, 2)
+        self.assertTrue(a.succeeded)
+        # Only the log of the failed download is kept
+        self.assertFalse(os.path.exists(flaky.log_file))
+        self.assertFalse(os.path.exists(a.log_file))
+        self.assertIn(('flaky', 'retrying'), self.progress)
+        self.assertIn(('broken', 'failed'), self.progress)
+
+        summary = scheduler.summary()
+        self.assertIn("2 of 3 downloads succeeded", summary)
+        self.assertIn(broken.log_file, summary)
+        with open(broken.log_file) as f:
+            self.assertEqual(f.read(), "downloading broken\n" * 2)
+
+    def test_library_download_many(self):
+        config = {
+            'download_dir': self.download_dir,
+            'install_dir': self.download_dir,
+            'download_jobs': 2,
+            'cache_dir': os.path.join(self.temp_dir.name, 'cache'),
+            'lgogdownloader': {
+                'subdir-game': '%gamename%',
+                'subdir-dlc': 'dlc/%dlcname%',
+            },
+        }
+        library = Library(GOG_LIBRARY, config)
+        jobs = library.download_many(['deus_ex', 'age_of_wonders'])
+        self.assertEqual(len(jobs), 2)
+        self.assertEqual(
+            os.path.dirname(jobs[0].log_file),
+            os.path.join(self.temp_dir.name, 'cache', 'download-logs')
+        )
+        self.assertEqual(
+            [g.name for g in library.downloaded_games],
+            ['age_of_wonders', 'deus_ex']
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from gogtool.browser import Args
+from gogtool.library import Library
+from gogtool.service import LibraryService
+from tests.helpers import GOG_LIBRARY
+
+
+class ServiceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config = {
+            'download_dir': os.path.join(self.temp_dir.name, 'downloads'),
+            'install_dir': os.path.join(self.temp_dir.name, 'games'),
+            'gogdb_offline': True,
+            'lgogdownloader': {
+                'subdir-game': '%gamename%',
+                'subdir-dlc': 'dlc/%dlcname%',
+            },
+        }
+        os.makedirs(os.path.join(self.config['install_dir'], 'tyranny_game'))
+        self.loaded = []
+        self.service = LibraryService(
+            Args(), config=self.config, loader=self.load_library,
+            refresh_interval=0, watch=False
+        )
+
+    def tearDown(self):
+        self.service.stop()
+        self.temp_dir.cleanup()
+
+    def load_library(self):
+        library = Library(GOG_LIBRARY, self.config)
+        self.loaded.append(library)
+        return library
+
+
+class TestLibraryService(ServiceTestCase):
+
+    def test_loaded_once(self):
+        with self.service.library() as library:
+            first = library
+        with self.service.library() as library:
+            self.assertIs(library, first)
+        self.assertEqual(len(self.loaded), 1)
+
+    def test_run(self):
+        games = self.service.run(Args(list='installed', platform='l'))
+        self.assertEqual([g.name for g in games], ['tyranny_game'])
+        self.service.run(Args(list='installed', platform='l'))
+        self.assertEqual(len(self.loaded), 1)
+
+    def test_submit(self):
+        started = threading.Event()
+        finish = threading.Event()
+
+        def run_gogtool(config, library, args, cli=False):
+            started.set()
+            finish.wait(5)
+            return library
+
+        with mock.patch('gogtool.service.run_gogtool', run_gogtool):
+            future = self.service.submit(Args(download=['tyranny_game']))
+            self.assertTrue(started.wait(5))
+            # The library can be used while the command runs
+            with self.service.library() as library:
+                self.assertIs(library, self.loaded[0])
+            finish.set()
+            self.assertIs(future.result(5), self.loaded[0])
+        # and is reloaded once it is done
+        with self.service.library() as library:
+            self.assertIs(library, self.loaded[1])
+
+    def test_invalidate(self):
+        with self.service.library() as library:
+            first = library
+        os.makedirs(os.path.join(self.config['install_dir'], 'darkest_dungeon'))
+        self.service.invalidate()
+        self.assertEqual(len(self.loaded), 1)
+        with self.service.library() as library:
+            self.assertIsNot(library, first)
+            self.assertEqual([g.name for g in library.installed_games],
+                             ['darkest_dungeon', 'tyranny_game'])
+
+    def test_refresh_while_in_use(self):
+        refreshed = threading.Event()
+
+        def refresh():
+            self.service.refresh()
+            refreshed.set()
+
+        with self.service.library() as library:
+            thread = threading.Thread(target=refresh)
+            thread.start()
+            # The new library is built while the current one is in use,
+            # but only swapped in afterwards
+            self.assertFalse(refreshed.wait(0.5))
+            self.assertEqual(len(self.loaded), 2)
+            self.assertIs(self.service._library, library)
+        thread.join(5)
+        with self.service.library() as library:
+            self.assertIs(library, self.loaded[1])
+
+    def test_background_refresh(self):
+        self.service.refresh_interval = 0.05
+        self.service.start()
+        deadline = time.monotonic() + 5
+        while len(self.loaded) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertGreaterEqual(len(self.loaded), 3)
+        self.service.stop()
+        loaded = len(self.loaded)
+        time.sleep(0.1)
+        self.assertEqual(len(self.loaded), loaded)
+
+    def test_watch(self):
+        os.makedirs(self.config['download_dir'])
+        self.service.watch = True
+        with self.service.library() as library:
+            self.assertEqual(len(library.installed_games), 1)
+        os.makedirs(os.path.join(self.config['install_dir'], 'darkest_dungeon'))
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            with self.service.library() as library:
+                if len(library.installed_games) == 2:
+                    break
+            time.sleep(0.05)
+        self.assertEqual(len(library.installed_games), 2)
+        self.assertEqual(len(self.loaded), 1)
+
+
+class TestGUI(ServiceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        from gui import app
+        self.app = app
+        self.app.service = self.service
+        self.client = app.app.test_client()
+
+    def tearDown(self):
+        self.app.service = None
+        super().tearDown()
+
+    def test_list_games(self):
+        for _ in range(2):
+            response = self.client.get('/games/installed')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'Tyranny', response.data)
+        self.assertEqual(len(self.loaded), 1)
+
+    def test_list_games_while_playing(self):
+        playing = threading.Event()
+        game_exit = threading.Event()
+        responses = []
+
+        def run(game):
+            playing.set()
+            game_exit.wait(5)
+
+        def get(url):
+            thread = threading.Thread(
+                target=lambda: responses.append(self.client.get(url))
+            )
+            thread.start()
+            return thread
+
+        with mock.patch('gogtool.game.Game.run', run):
+            launch = get('/launch?game=tyranny_game')
+            self.assertTrue(playing.wait(5))
+            # Pages don't wait for the game to exit
+            page = get('/games/installed')
+            page.join(2)
+            self.assertFalse(page.is_alive())
+            game_exit.set()
+            launch.join(5)
+        self.assertEqual(sorted(r.status_code for r in responses), [200, 302])
+
+    def test_install_in_background(self):
+        with mock.patch.object(self.service, 'submit') as submit:
+            response = self.client.get('/install?game=darkest_dungeon')
+        self.assertEqual(response.status_code, 302)
+        submit.assert_called_once_with(Args(install=['darkest_dungeon']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from gogtool import snapshot, util
+from gogtool.game import Game
+
+DIR = os.path.dirname(__file__)
+DATA_PATH = os.path.join(DIR, "test_library_data/gamedetails.json")
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.temp_dir.name, 'cache')
+        self.data_path = os.path.join(self.temp_dir.name, 'gamedetails.json')
+        shutil.copy(DATA_PATH, self.data_path)
+        self.snapshot_path = os.path.join(self.cache_dir, snapshot.SNAPSHOT_FILE)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_load_library(self):
+        gog_library = snapshot.load_library(self.data_path, self.cache_dir)
+        raw_library = util.load_json(DATA_PATH)
+        self.assertEqual(gog_library['date'], raw_library['date'])
+        self.assertEqual(len(gog_library['games']), len(raw_library['games']))
+        self.assertTrue(os.path.exists(self.snapshot_path))
+
+    def test_snapshot_reused(self):
+        first = snapshot.load_library(self.data_path, self.cache_dir)
+        mtime = os.stat(self.snapshot_path).st_mtime_ns
+        second = snapshot.load_library(self.data_path, self.cache_dir)
+        self.assertEqual(first, second)
+        self.assertEqual(os.stat(self.snapshot_path).st_mtime_ns, mtime)
+
+    def test_snapshot_invalidated(self):
+        snapshot.load_library(self.data_path, self.cache_dir)
+        raw_library = util.load_json(self.data_path)
+        raw_library['games'] = raw_library['games'][:3]
+        util.dump_json(raw_library, self.data_path)
+        gog_library = snapshot.load_library(self.data_path, self.cache_dir)
+        self.assertEqual(len(gog_library['games']), 3)
+
+    def test_normalized_games(self):
+        gog_library = snapshot.load_library(self.data_path, self.cache_dir)
+        raw_library = util.load_json(DATA_PATH)
+        for game_data, raw_data in zip(gog_library['games'], raw_library['games']):
+            self.assertNotIn('extras', game_data)
+            game = Game(game_data)
+            raw_game = Game(raw_data)
+            self.assertEqual(game.name, raw_game.name)
+            self.assertEqual(game.linux_available, raw_game.linux_available)
+            self.assertEqual(game.server_files, raw_game.server_files)
+            self.assertEqual(
+                [dlc.name for dlc in game.installable_dlcs],
+                [dlc.name for dlc in raw_game.installable_dlcs]
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
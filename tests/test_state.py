@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from gogtool import util
+from gogtool.library import Library
+from gogtool.state import STATE_FILE, StateStore
+
+DIR = os.path.dirname(__file__)
+DATA_PATH = os.path.join(DIR, "test_library_data/gamedetails.json")
+GOG_LIBRARY = util.load_json(DATA_PATH)
+SETUP_FILE = "setup_deus_ex_goty_1.112fm(revision_1.3.1)_(17719).exe"
+# Well outside of the interval in which listings aren't stored
+PAST = 1500000000
+
+
+def age(*paths):
+    for path in paths:
+        os.utime(path, (PAST, PAST))
+
+
+class TestStateStore(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        self.download_dir = os.path.join(self.root, 'downloads')
+        self.install_dir = os.path.join(self.root, 'games')
+        self.game_dir = os.path.join(self.download_dir, 'deus_ex')
+        os.makedirs(self.game_dir)
+        os.makedirs(os.path.join(self.install_dir, 'age_of_wonders'))
+        with open(os.path.join(self.game_dir, SETUP_FILE), 'w') as f:
+            f.write('setup')
+        age(self.game_dir, self.download_dir, self.install_dir)
+        self.state = StateStore(os.path.join(self.root, 'data', STATE_FILE))
+        self.config = {
+            'download_dir': self.download_dir,
+            'install_dir': self.install_dir,
+            'lgogdownloader': {
+                'subdir-game': '%gamename%',
+                'subdir-dlc': 'dlc/%dlcname%',
+            },
+        }
+
+    def tearDown(self):
+        self.state.close()
+        self.temp_dir.cleanup()
+
+    def test_scandir_reuses_listing(self):
+        first = self.state.scandir(self.game_dir)
+        with mock.patch.object(util, 'scandir') as scandir_mock:
+            second = self.state.scandir(self.game_dir)
+        scandir_mock.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertEqual(second[0].name, SETUP_FILE)
+        self.assertEqual(second[0].size, 5)
+        self.assertFalse(second[0].is_dir())
+
+    def test_scandir_file_written_in_place(self):
+        self.state.scandir(self.game_dir)
+        setup_file = os.path.join(self.game_dir, SETUP_FILE)
+        # A resumed download appends without changing the directory
+        with open(setup_file, 'a') as f:
+            f.write(' resumed')
+        age(self.game_dir)
+        with mock.patch.object(util, 'scandir') as scandir_mock:
+            entries = self.state.scandir(self.game_dir)
+        scandir_mock.assert_not_called()
+        self.assertEqual(entries[0].size, 13)
+        self.assertEqual(entries[0].mtime_ns, os.stat(setup_file).st_mtime_ns)
+        row = self.state.db.execute('SELECT size FROM entries').fetchone()
+        self.assertEqual(row, (13,))
+
+    def test_scandir_changed(self):
+        self.state.scandir(self.game_dir)
+        open(os.path.join(self.game_dir, 'patch.sh'), 'w').close()
+        entries = self.state.scandir(self.game_dir)
+        self.assertEqual(len(entries), 2)
+
+    def test_scandir_recent_change_not_stored(self):
+        os.utime(self.game_dir)
+        self.state.scandir(self.game_dir)
+        with mock.patch.object(util, 'scandir', return_value=[]) as scandir_mock:
+            self.state.scandir(self.game_dir)
+        scandir_mock.assert_called_once_with(self.game_dir)
+
+    def test_scandir_missing(self):
+        self.state.scandir(self.game_dir)
+        util.rmdir(self.game_dir)
+        self.assertEqual(self.state.scandir(self.game_dir), [])
+
+    def test_library_rescan_is_incremental(self):
+        Library(GOG_LIBRARY, self.config, state=self.state)
+        with mock.patch.object(util, 'scandir', wraps=util.scandir) as scandir_mock:
+            library = Library(GOG_LIBRARY, self.config, state=self.state)
+        scandir_mock.assert_not_called()
+        self.assertEqual([g.name for g in library.downloaded_games], ['deus_ex'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import json
+import os
+import tempfile
+import unittest
+
+from gogtool import util
+from gogtool.game import normalize_game_data
+
+DIR = os.path.dirname(__file__)
+DATA_PATH = os.path.join(DIR, "test_library_data/gamedetails.json")
+
+
+class TestLoadJSONStreamed(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.json_path = os.path.join(self.temp_dir.name, 'data.json')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def load_both(self, data, **kwargs):
+        with open(self.json_path, 'w') as f:
+            json.dump(data, f, **kwargs)
+        return (
+            util.load_json(self.json_path),
+            util.load_json_streamed(self.json_path, 'items', lambda x: x,
+                                    chunk_size=7),
+        )
+
+    def test_matches_full_loader(self):
+        expected = util.load_json(DATA_PATH)
+        expected['games'] = [normalize_game_data(g) for g in expected['games']]
+        for chunk_size in (16, 4096, util.JSON_CHUNK_SIZE):
+            gog_library = util.load_json_streamed(
+                DATA_PATH, 'games', normalize_game_data, chunk_size=chunk_size
+            )
+            self.assertEqual(gog_library, expected)
+
+    def test_values_at_chunk_boundaries(self):
+        data = {'n': 1234567, 'items': [1, 22, 333, -4.5e10, "a,]}"], 'm': 89}
+        full, streamed = self.load_both(data, separators=(',', ':'))
+        self.assertEqual(full, streamed)
+        full, streamed = self.load_both(data, indent='\t')
+        self.assertEqual(full, streamed)
+
+    def test_numbers_split_between_chunks(self):
+        text = '{"n":-1.5e3,"items":[2.25,-7E-2,10],"m":0.5}'
+        with open(self.json_path, 'w') as f:
+            f.write(text)
+        for chunk_size in range(1, len(text) + 1):
+            self.assertEqual(
+                util.load_json_streamed(self.json_path, 'items', lambda x: x,
+                                        chunk_size=chunk_size),
+                json.loads(text)
+            )
+
+    def test_empty(self):
+        full, streamed = self.load_both({'items': []})
+        self.assertEqual(full, streamed)
+        full, streamed = self.load_both({})
+        self.assertEqual(full, streamed)
+
+    def test_truncated(self):
+        with open(self.json_path, 'w') as f:
+            f.write('{"items": [1, 2, {"a": ')
+        with self.assertRaises(json.JSONDecodeError):
+            util.load_json_streamed(self.json_path, 'items', lambda x: x)
+
+
+class TestDeleteFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        self.paths = []
+        for i in range(1200):
+            path = os.path.join(self.root, 'a', str(i % 3), 'b', f'{i}.bin')
+            util.mkdir(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write('x')
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_unlink_many(self):
+        missing = os.path.join(self.root, 'missing')
+        removed = util.unlink_many(self.paths + [missing], workers=4)
+        self.assertEqual(removed, 1200)
+        self.assertFalse(any(os.path.exists(p) for p in self.paths))
+
+    def test_prune_empty_dirs(self):
+        keep = os.path.join(self.root, 'a', '0', 'save')
+        with open(keep, 'w') as f:
+            f.write('save')
+        util.unlink_many(self.paths)
+        dirs = [os.path.dirname(p) for p in self.paths]
+        self.assertEqual(util.prune_empty_dirs(dirs, self.root), 5)
+        self.assertEqual(os.listdir(self.root), ['a'])
+        self.assertEqual(os.listdir(os.path.join(self.root, 'a')), ['0'])
+
+    def test_format_size(self):
+        self.assertEqual(util.format_size(512), '512 B')
+        self.assertEqual(util.format_size(3 * 1024 ** 3 // 2), '1.5 GiB')
+
+
+if __name__ == '__main__':
+    unittest.main()
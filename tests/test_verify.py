@@ -0,0 +1,114 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from gogtool import hashcache, verify
+from tests.helpers import make_installer
+
+XML = '<file name="{name}" available="1" md5="{md5}" chunks="1" ' \
+      'total_size="{size}"><chunk id="0" from="0" to="{size}" ' \
+      'method="md5">{md5}</chunk></file>'
+GAME = 'some_game'
+
+
+class TestVerifier(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.xml_dir = os.path.join(self.temp_dir.name, 'xml')
+        self.cache_dir = os.path.join(self.temp_dir.name, 'cache')
+        self.download_dir = os.path.join(self.temp_dir.name, 'downloads')
+        os.makedirs(self.xml_dir)
+        os.makedirs(self.download_dir)
+        self.verifier = verify.Verifier(self.xml_dir, self.cache_dir)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, name, content, md5=None):
+        path = os.path.join(self.download_dir, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        if md5 is not None:
+            game_xml_dir = os.path.join(self.xml_dir, GAME)
+            os.makedirs(game_xml_dir, exist_ok=True)
+            with open(os.path.join(game_xml_dir, name + '.xml'), 'w') as f:
+                f.write(XML.format(name=name, md5=md5, size=len(content)))
+        return path
+
+    def test_md5_file(self):
+        for size in (0, 1, 4095, 4096, 10000):
+            content = os.urandom(size)
+            path = self.write('setup.bin', content)
+            self.assertEqual(verify.md5_file(path, chunk_size=4096),
+                             hashlib.md5(content).hexdigest())
+
+    def test_lgog_md5(self):
+        content = b'windows installer'
+        good = self.write('setup_good.exe', content,
+                          md5=hashlib.md5(content).hexdigest())
+        bad = self.write('setup_bad.exe', content[:-1],
+                         md5=hashlib.md5(content).hexdigest())
+        unknown = self.write('setup_unknown.exe', content)
+
+        results = self.verifier.verify([(good, GAME), (bad, GAME), (unknown, GAME)])
+        self.assertEqual([r.status for r in results], [
+            verify.STATUS_OK, verify.STATUS_CORRUPT, verify.STATUS_UNKNOWN,
+        ])
+
+    def test_hash_cache(self):
+        content = b'windows installer'
+        path = self.write('setup.exe', content,
+                          md5=hashlib.md5(content).hexdigest())
+        os.utime(path, (0, 0))
+        cache = hashcache.HashCache(os.path.join(self.cache_dir, 'hashes.sqlite'))
+        verifier = verify.Verifier(self.xml_dir, hash_cache=cache)
+        self.assertEqual(verifier.verify_one(path, GAME).status, verify.STATUS_OK)
+        self.assertEqual(cache.get(path), hashlib.md5(content).hexdigest())
+        cache.close()
+
+    def test_installer_crcs(self):
+        path = make_installer(os.path.join(self.download_dir, 'game.sh'),
+                              {'start.sh': 'start', 'data.bin': 'data' * 100})
+        self.assertEqual(self.verifier.verify_one(path, GAME).status, verify.STATUS_OK)
+
+        with open(path, 'rb') as f:
+            content = f.read()
+        # Damage the stored data of data.bin
+        offset = content.index(b'data' * 100)
+        self.write('game.sh', content[:offset] + b'x' + content[offset + 1:])
+        result = self.verifier.verify_one(path, GAME)
+        self.assertEqual(result.status, verify.STATUS_CORRUPT)
+        self.assertIn('data/noarch/data.bin', result.detail)
+
+        self.write('game.sh', content[:100])
+        self.assertEqual(self.verifier.verify_one(path, GAME).status,
+                         verify.STATUS_CORRUPT)
+
+    def test_cached_results(self):
+        path = make_installer(os.path.join(self.download_dir, 'game.sh'),
+                              {'start.sh': 'start'})
+        self.verifier.verify([(path, GAME)])
+
+        verifier = verify.Verifier(self.xml_dir, self.cache_dir)
+        with mock.patch('gogtool.verify.verify_file') as verify_file:
+            result = verifier.verify_one(path, GAME)
+        verify_file.assert_not_called()
+        self.assertEqual(result.status, verify.STATUS_OK)
+
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        with mock.patch('gogtool.verify.verify_file') as verify_file:
+            verifier.verify_one(path, GAME)
+        verify_file.assert_called_once()
+
+    def test_missing_file(self):
+        path = os.path.join(self.download_dir, 'missing.sh')
+        self.assertEqual(self.verifier.verify_one(path, GAME).status,
+                         verify.STATUS_CORRUPT)
+
+
+if __name__ == '__main__':
+    unittest.main()
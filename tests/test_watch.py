@@ -0,0 +1,90 @@
+import os
+import tempfile
+import time
+import unittest
+
+from gogtool import util
+from gogtool.library import Library
+from gogtool.watch import LibraryWatcher
+
+DIR = os.path.dirname(__file__)
+DATA_PATH = os.path.join(DIR, "test_library_data/gamedetails.json")
+GOG_LIBRARY = util.load_json(DATA_PATH)
+SETUP_FILE = "setup_deus_ex_goty_1.112fm(revision_1.3.1)_(17719).exe"
+DLC_SETUP_FILE = "setup_deus_ex_revision.exe"
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class TestLibraryWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.download_dir = os.path.join(self.temp_dir.name, 'downloads')
+        self.install_dir = os.path.join(self.temp_dir.name, 'games')
+        util.mkdir(self.download_dir)
+        util.mkdir(self.install_dir)
+        config = {
+            'download_dir': self.download_dir,
+            'install_dir': self.install_dir,
+            'lgogdownloader': {
+                'subdir-game': '%gamename%',
+                'subdir-dlc': 'dlc/%dlcname%',
+            },
+        }
+        self.library = Library(GOG_LIBRARY, config)
+        self.changes = []
+        self.watcher = LibraryWatcher(self.library, on_change=self.changes.append)
+        self.watcher.start()
+
+    def tearDown(self):
+        self.watcher.stop()
+        self.temp_dir.cleanup()
+
+    def downloaded(self):
+        return [g.name for g in self.library.downloaded_games]
+
+    def test_download(self):
+        game_dir = os.path.join(self.download_dir, 'deus_ex')
+        util.mkdir(game_dir)
+        open(os.path.join(game_dir, SETUP_FILE), 'w').close()
+        self.assertTrue(wait_for(lambda: self.downloaded() == ['deus_ex']))
+
+        util.rm(os.path.join(game_dir, SETUP_FILE))
+        self.assertTrue(wait_for(lambda: self.downloaded() == []))
+
+        open(os.path.join(game_dir, SETUP_FILE), 'w').close()
+        self.assertTrue(wait_for(lambda: self.downloaded() == ['deus_ex']))
+        util.rmdir(game_dir)
+        self.assertTrue(wait_for(lambda: self.downloaded() == []))
+
+    def test_dlc_download(self):
+        dlc_dir = os.path.join(
+            self.download_dir, 'deus_ex', 'dlc', 'deus_ex_revision'
+        )
+        util.mkdir(dlc_dir)
+        game = self.library.get_game('deus_ex')
+        dlc, = game.installable_dlcs
+        self.assertTrue(wait_for(lambda: dlc.download_dir == dlc_dir))
+        open(os.path.join(dlc_dir, DLC_SETUP_FILE), 'w').close()
+        self.assertTrue(wait_for(lambda: dlc.is_downloaded))
+
+    def test_install(self):
+        game_dir = os.path.join(self.install_dir, 'Age of Wonders')
+        util.mkdir(game_dir)
+        installed = lambda: [g.name for g in self.library.installed_games]
+        self.assertTrue(wait_for(lambda: installed() == ['age_of_wonders']))
+        util.rmdir(game_dir)
+        self.assertTrue(wait_for(lambda: installed() == []))
+        self.assertIn(self.library.get_game('age_of_wonders'), self.changes)
+
+
+if __name__ == '__main__':
+    unittest.main()